@@ -0,0 +1,100 @@
+"""
+Benchmarks for the DTR conversion pipeline.
+
+Generates a synthetic month of punches and times the conversion stages.
+Run with:  python benchmark.py [employees ...]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import excelconverter
+
+
+def make_punches(employees, year=2025, month=1, seed=0):
+    # A morning and an afternoon punch per weekday, with some duplicates and gaps
+    rng = np.random.default_rng(seed)
+    days = pd.date_range(f"{year}-{month:02d}-01", periods=pd.Period(f"{year}-{month:02d}").days_in_month)
+    days = days[days.dayofweek < 5]
+
+    emp = np.repeat(np.arange(1, employees + 1), len(days))
+    day = np.tile(days.values, employees)
+
+    morning = day + pd.to_timedelta(rng.integers(7 * 60 + 30, 9 * 60, len(day)), unit="min")
+    duplicate = morning + pd.to_timedelta(rng.integers(0, 5, len(day)), unit="min")
+    afternoon = day + pd.to_timedelta(rng.integers(16 * 60 + 30, 18 * 60, len(day)), unit="min")
+
+    keep_dup = rng.random(len(day)) < 0.2
+    names = np.concatenate([emp, emp[keep_dup], emp])
+    stamps = np.concatenate([morning, duplicate[keep_dup], afternoon])
+
+    df = pd.DataFrame({"Name": [f"EMPLOYEE {i:04d}" for i in names], "Timestamp": stamps})
+    # Drop roughly 5% of the punches to produce No In/No Out/Absent days
+    df = df[rng.random(len(df)) > 0.05]
+    return df.sort_values("Timestamp").reset_index(drop=True)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def legacy_hours(df):
+    # Frozen copy of the per-row rescan filter_in_out_entries used before
+    # sessionize_punches, kept as the reference the new code is timed against
+    df = df.copy()
+    df["Date"] = df["Timestamp"].dt.strftime('%Y-%m-%d')
+    df["Time"] = df["Timestamp"].dt.strftime('%H:%M:%S')
+    df["Hour"] = df["Timestamp"].dt.hour
+    grouped = df.groupby(["Name", "Date"])["Time"].agg(list).reset_index()
+    grouped["Hours"] = grouped.apply(
+        lambda row: df[(df["Name"] == row["Name"]) & (df["Date"] == row["Date"])]["Hour"].tolist(),
+        axis=1
+    )
+    return grouped
+
+
+def bench_sessionize(sizes):
+    print("per-row rescan vs sessionize_punches + filter_in_out_entries (seconds)")
+    print(f"{'employees':>10} {'punches':>10} {'per-row rescan':>15} {'sessionize':>15} {'summary pivot':>15}")
+    for employees in sizes:
+        df = make_punches(employees)
+        legacy = timed(legacy_hours, df)
+        start = time.perf_counter()
+        # Repeat punches are dropped at load time, ahead of the sessionization
+        days = excelconverter.sessionize_punches(excelconverter.suppress_duplicate_punches(df), "2025-01")
+        sessionize = time.perf_counter() - start
+        pivot = timed(excelconverter.filter_in_out_entries, days)
+        print(f"{employees:>10} {len(df):>10} {legacy:>15.3f} {sessionize:>15.3f} {pivot:>15.3f}")
+
+
+def bench_engines(sizes):
+    # The same month rendered by every workbook engine, openpyxl being the reference
+    engines = ["openpyxl", "write-only"]
+    if excelconverter.xlsxwriter is not None:
+        engines.append("xlsxwriter")
+
+    print("write_dtr_workbook per engine (seconds, file size in KB)")
+    print(f"{'employees':>10}" + "".join(f" {engine:>18}" for engine in engines))
+    with tempfile.TemporaryDirectory() as output_dir:
+        for employees in sizes:
+            df = excelconverter.suppress_duplicate_punches(make_punches(employees))
+            df["Name"] = df["Name"].astype("category")
+            line = f"{employees:>10}"
+            for engine in engines:
+                save_path = os.path.join(output_dir, f"{engine}.xlsx")
+                elapsed = timed(excelconverter.write_dtr_workbook, save_path, df, "2025-01", engine)
+                line += f" {elapsed:>10.3f} {os.path.getsize(save_path) // 1024:>6}K"
+            print(line)
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [50, 100, 200]
+    bench_sessionize(sizes)
+    print()
+    bench_engines(sizes)
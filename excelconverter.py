@@ -1,18 +1,38 @@
+import io
 import os
+import re
+import tempfile
+import zipfile
+import hashlib
 import sqlite3
+import numpy as np
 import pandas as pd
 import tkinter as tk
-from tkinter import filedialog, messagebox, ttk
+from tkinter import filedialog, messagebox, simpledialog, ttk
 from datetime import datetime
-from openpyxl.styles import Alignment, Font, PatternFill
-from openpyxl.utils import get_column_letter
-from openpyxl import load_workbook
-from datetime import datetime, timedelta
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.styles.borders import DEFAULT_BORDER
+from openpyxl.styles.fonts import DEFAULT_FONT
+from openpyxl.utils import column_index_from_string, get_column_letter
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.worksheet.cell_range import CellRange
 import subprocess
+import sys
+import multiprocessing
+from collections import namedtuple
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import openpyxl
 
+try:
+    import xlsxwriter  # Optional, only needed for the xlsxwriter engine
+except ImportError:
+    xlsxwriter = None
+
 # Global employee list
 employee_list = {}
+# Holidays and suspensions by "YYYY-MM-DD" date, see load_holidays
+holiday_list = {}
 history_window_open = False
 history_window = None
 current_employee_file = None
@@ -23,6 +43,92 @@ current_dat_file = None
 history_window_open = False
 history_window = None  # Ensure global reference to history window
 
+# Bytes of DAT lines parsed at a time when streaming attendance logs
+DAT_CHUNK_BYTES = 4 * 1024 * 1024
+
+# Parsed DAT punches are cached per month next to conversion_history.db
+DAT_CACHE_DIR = "dat_cache"
+DAT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Month choice that converts only the newest month of each DAT file
+LATEST_MONTH = "latest"
+
+# Punches within this many minutes of the employee's previous punch are
+# repeats of it (double taps, retries) and are dropped when a DAT file is
+# loaded. 0 keeps every punch.
+DUPLICATE_PUNCH_WINDOW_MINUTES = 5
+
+# Workbook engine used for the DTR files: "openpyxl" (the reference),
+# "write-only" (streaming openpyxl) or "xlsxwriter" (constant memory).
+# None picks the write-only engine for rosters of at least
+# STREAMING_EMPLOYEE_THRESHOLD employees, which keeps memory flat
+WORKBOOK_ENGINE = None
+STREAMING_EMPLOYEE_THRESHOLD = 300
+
+# Work schedule used for employees and weekdays without an assignment in the
+# schedules table, as (id, name, start, end, lunch out, lunch in, required
+# work, in/out split, day cutoff). Times are minutes of the day; an end,
+# lunch or split before the start falls on the next day (night shifts), and
+# punches before the day cutoff belong to the previous day's shift.
+DEFAULT_SCHEDULE = (1, "Regular", 8 * 60, 17 * 60, 12 * 60 + 1, 12 * 60 + 55, 8 * 60, 12 * 60, 0)
+
+# Day statuses without undertime, shown as such on the DTR when the day has no logs
+NON_WORKING_STATUSES = {"SATURDAY", "SUNDAY", "HOLIDAY", "SUSPENSION"}
+
+
+# Shared cell styles, registered once per workbook and applied by name
+THIN_BORDER = Border(left=Side(style='thin'), right=Side(style='thin'),
+                     top=Side(style='thin'), bottom=Side(style='thin'))
+CENTER = Alignment(horizontal='center')
+BOLD = Font(bold=True)
+
+CELL_STYLES = {
+    "DTR Center": {"alignment": CENTER},
+    "DTR Bold": {"font": BOLD, "alignment": CENTER},
+    "DTR Name": {"font": Font(bold=True, underline='single'), "alignment": CENTER},
+    "DTR Border": {"border": THIN_BORDER},
+    "DTR Box": {"alignment": CENTER, "border": THIN_BORDER},
+    "DTR Bold Box": {"font": BOLD, "alignment": CENTER, "border": THIN_BORDER},
+    "DTR Total": {"font": BOLD, "alignment": CENTER, "border": THIN_BORDER},
+    "DTR Name Box": {"alignment": Alignment(horizontal='left'), "border": THIN_BORDER},
+    "DTR Time Box": {"alignment": Alignment(horizontal='center', vertical='center'), "border": THIN_BORDER},
+    "DTR Header": {"font": BOLD, "alignment": Alignment(horizontal='center', vertical='center'), "border": THIN_BORDER},
+    "DTR Title": {
+        "font": Font(name='Calibri', size=20, bold=True),
+        "alignment": CENTER,
+        "fill": PatternFill(start_color='F4B084', end_color='F4B084', fill_type='solid')
+    },
+}
+
+# Day of week fills for the summary sheet headers
+DAY_FILL_COLORS = {
+    'MON': 'D9D9D9',
+    'TUE': 'BFBFBF',
+    'WED': 'D9C3E6',
+    'THU': 'C6E0B4',
+    'FRI': 'BDD7EE',
+    'SAT': 'FFF2CC',
+    'SUN': 'FCE4D6'
+}
+for day_name, color in DAY_FILL_COLORS.items():
+    CELL_STYLES[f"DTR Day {day_name}"] = {
+        "font": BOLD,
+        "alignment": CENTER,
+        "border": THIN_BORDER,
+        "fill": PatternFill(start_color=color, end_color=color, fill_type='solid')
+    }
+
+def register_cell_styles(workbook):
+    registered = set(workbook.named_styles)
+    for name, style in CELL_STYLES.items():
+        if name not in registered:
+            workbook.add_named_style(NamedStyle(
+                name=name,
+                font=style.get("font", DEFAULT_FONT),
+                border=style.get("border", DEFAULT_BORDER),
+                fill=style.get("fill"),
+                alignment=style.get("alignment")
+            ))
 
 def create_database():
     conn = sqlite3.connect("conversion_history.db")
@@ -46,374 +152,357 @@ def create_database():
         )
     """)
 
+    # Create dat_sources table to remember how far each DAT file was processed,
+    # prefix_checksum being the SHA-256 of the file up to offset
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS dat_sources (
+            path TEXT PRIMARY KEY,
+            size INTEGER,
+            offset INTEGER,
+            prefix_checksum TEXT,
+            rows_read INTEGER,
+            updated_at TEXT
+        )
+    """)
+
+    # Create dat_source_months table, the DAT cache entry of every month of a processed prefix
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS dat_source_months (
+            checksum TEXT NOT NULL,
+            month TEXT NOT NULL,
+            entry TEXT NOT NULL,
+            PRIMARY KEY (checksum, month)
+        )
+    """)
+
+    # Create dat_renders table, what every monthly workbook was last rendered from
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS dat_renders (
+            output_path TEXT PRIMARY KEY,
+            version TEXT NOT NULL,
+            rendered_at TEXT
+        )
+    """)
+
+    # Create schedules table, times in minutes of the day (see DEFAULT_SCHEDULE)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schedules (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            start_minute INTEGER NOT NULL,
+            end_minute INTEGER NOT NULL,
+            lunch_out_minute INTEGER,
+            lunch_in_minute INTEGER,
+            required_minutes INTEGER NOT NULL,
+            split_minute INTEGER NOT NULL DEFAULT 720,
+            day_cutoff_minute INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO schedules VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", DEFAULT_SCHEDULE)
+
+    # Create employee_schedules table, weekday 0 is Monday
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS employee_schedules (
+            employee_id INTEGER NOT NULL,
+            weekday INTEGER NOT NULL,
+            schedule_id INTEGER NOT NULL REFERENCES schedules(id),
+            PRIMARY KEY (employee_id, weekday)
+        )
+    """)
+
+    # Create holidays table, kind is HOLIDAY or SUSPENSION (work suspended)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS holidays (
+            date TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            kind TEXT NOT NULL DEFAULT 'HOLIDAY'
+        )
+    """)
+
+    # Create monthly_attendance table, refreshed by every conversion of a month
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS monthly_attendance (
+            month TEXT NOT NULL,
+            name TEXT NOT NULL,
+            employee_no INTEGER,
+            days_present INTEGER NOT NULL,
+            absences INTEGER NOT NULL,
+            no_in INTEGER NOT NULL,
+            no_out INTEGER NOT NULL,
+            saturdays INTEGER NOT NULL,
+            undertime_minutes INTEGER NOT NULL,
+            source TEXT,
+            updated_at TEXT,
+            PRIMARY KEY (month, name)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_monthly_attendance_employee ON monthly_attendance (employee_no, month)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_monthly_attendance_absences ON monthly_attendance (month, absences)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_monthly_attendance_undertime ON monthly_attendance (month, undertime_minutes)")
+
     conn.commit()
     conn.close()
 
-def format_dtr_summary_sheet(writer, df, month_year):
+def minute_text(minute, twelve_hour=False):
+    # "HH:MM" or "h:MM AM" text of a minute of the day, next-day minutes wrap around
+    hour, minute = divmod(minute % 1440, 60)
+    if twelve_hour:
+        return f"{(hour - 1) % 12 + 1}:{minute:02} {'AM' if hour < 12 else 'PM'}"
+    return f"{hour:02}:{minute:02}"
+
+def compile_work_schedules(schedules, assignments):
     """
-    Formats the DTR summary sheet to match the layout in the example image
-    while using the existing data processed by filter_in_out_entries
+    Compiles schedule rows (laid out like DEFAULT_SCHEDULE) and
+    (employee_id, weekday, schedule_id) assignments into lookup arrays.
+    Every array is indexed by schedule code; "table" maps the row of an
+    employee in "employees" and a weekday to a code, its last row holding
+    the default schedule for unassigned employees.
     """
-    from datetime import datetime
-    from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-    from openpyxl.utils import get_column_letter
-    
-    sheet_name = f"DTR - {month_year}"
-    
-    # Get the workbook and worksheet directly
-    workbook = writer.book
-    worksheet = workbook[sheet_name]
-    
-    # Get all date columns from the existing data
-    date_columns = [col for col in df.columns if "Time In" in col or "Time Out" in col]
-    unique_dates = sorted(set([col.split(" (")[0] for col in date_columns if " (" in col]))
-    
-    # Calculate total number of columns used in the sheet
-    # 2 columns for ID and NAME + 2 columns for each date (AM/PM)
-    total_columns = 2 + (len(unique_dates) * 2)
-    
-    # Clear existing merges to avoid conflicts
-    for merged_range in list(worksheet.merged_cells.ranges):
-        worksheet.unmerge_cells(str(merged_range))
-    
-    # Convert the column number to Excel column letter
-    last_column_letter = get_column_letter(total_columns)
-    
-    # Define orange fill for title
-    orange_fill = PatternFill(start_color='F4B084', end_color='F4B084', fill_type='solid')
-    
-    # Apply the title and formatting to A1 BEFORE merging
-    title_cell = worksheet.cell(row=1, column=1)
-    title_cell.value = month_year.upper()
-    title_cell.font = Font(name='Calibri', size=20, bold=True)
-    title_cell.alignment = Alignment(horizontal='center')
-    title_cell.fill = orange_fill
-    
-    # Merge the title across all columns
-    worksheet.merge_cells(f'A1:{last_column_letter}1')
-    
-    # Set the height for title row (row 1)
-    worksheet.row_dimensions[1].height = 30
-    
-    # Set the height for spacer row (row 2)
-    worksheet.row_dimensions[2].height = 15
-    
-    # Starting row and column for the ID and NAME headers
-    header_row = 3
-    start_col = 3  # Column C (after ID and Name)
-    
-    # Set heights for header rows (3, 4, 5)
-    worksheet.row_dimensions[header_row].height = 25     # Date row
-    worksheet.row_dimensions[header_row+1].height = 25   # Day name row
-    worksheet.row_dimensions[header_row+2].height = 25   # AM/PM row
-    
-    # Add ID and NAME headers
-    id_cell = worksheet.cell(row=header_row, column=1)
-    id_cell.value = "ID"
-    id_cell.font = Font(bold=True)
-    id_cell.alignment = Alignment(horizontal='center', vertical='center')
-    
-    name_cell = worksheet.cell(row=header_row, column=2)
-    name_cell.value = "NAME"
-    name_cell.font = Font(bold=True)
-    name_cell.alignment = Alignment(horizontal='center', vertical='center')
-    
-    # Set width for ID and NAME columns
-    worksheet.column_dimensions['A'].width = 15  # For ID column
-    worksheet.column_dimensions['B'].width = 30  # For NAME column
-    
-    # Define border style
-    thin_border = Border(left=Side(style='thin'), right=Side(style='thin'), 
-                         top=Side(style='thin'), bottom=Side(style='thin'))
-    
-    # Apply borders to the ID and NAME cells
-    id_cell.border = thin_border
-    name_cell.border = thin_border
-    
-    # Merge NAME cell vertically across rows 3, 4, and 5
-    worksheet.merge_cells(start_row=header_row, start_column=2, 
-                        end_row=header_row+2, end_column=2)
-    
-    # Merge ID cell vertically across rows 3, 4, and 5
-    worksheet.merge_cells(start_row=header_row, start_column=1, 
-                        end_row=header_row+2, end_column=1)
-    
-    # Define color fills based on day of week
-    day_fills = {
-        'MON': PatternFill(start_color='D9D9D9', end_color='D9D9D9', fill_type='solid'),
-        'TUE': PatternFill(start_color='BFBFBF', end_color='BFBFBF', fill_type='solid'),
-        'WED': PatternFill(start_color='D9C3E6', end_color='D9C3E6', fill_type='solid'),
-        'THU': PatternFill(start_color='C6E0B4', end_color='C6E0B4', fill_type='solid'),
-        'FRI': PatternFill(start_color='BDD7EE', end_color='BDD7EE', fill_type='solid'),
-        'SAT': PatternFill(start_color='FFF2CC', end_color='FFF2CC', fill_type='solid'),
-        'SUN': PatternFill(start_color='FCE4D6', end_color='FCE4D6', fill_type='solid')
-    }
-    
-    # Row colors for employee rows (alternating colors)
-    row_colors = [
-        PatternFill(start_color='FFD6D6', end_color='FFD6D6', fill_type='solid'),  # Light Red
-        PatternFill(start_color='E2EFDA', end_color='E2EFDA', fill_type='solid'),  # Light Green
-        PatternFill(start_color='FFF2CC', end_color='FFF2CC', fill_type='solid'),  # Light Yellow
-        PatternFill(start_color='DEEBF7', end_color='DEEBF7', fill_type='solid'),  # Light Blue
-    ]
-    
-    # Add date headers and set column widths for AM/PM columns
-    for i, date_str in enumerate(unique_dates):
-        date = datetime.strptime(date_str, '%Y-%m-%d')
-        # Date column
-        date_col = start_col + i*2
-        day_name = date.strftime('%a').upper()
-        formatted_date = date.strftime('%d/%m/%Y')
-        
-        # Get the appropriate fill for this day
-        current_fill = day_fills.get(day_name, None)
-        
-        # Set width for AM/PM columns to exactly 12.00 (approx 115 pixels)
-        am_col_letter = get_column_letter(date_col)
-        pm_col_letter = get_column_letter(date_col+1)
-        worksheet.column_dimensions[am_col_letter].width = 12.00
-        worksheet.column_dimensions[pm_col_letter].width = 12.00
-        
-        # Date cell formatting
-        date_cell = worksheet.cell(row=header_row, column=date_col)
-        date_cell.value = formatted_date
-        date_cell.font = Font(bold=True)
-        date_cell.alignment = Alignment(horizontal='center')
-        date_cell.border = thin_border
-        
-        next_date_cell = worksheet.cell(row=header_row, column=date_col+1)
-        next_date_cell.border = thin_border
-        
-        # Merge date cells
-        worksheet.merge_cells(start_row=header_row, start_column=date_col, 
-                             end_row=header_row, end_column=date_col+1)
-        
-        # Day name cell
-        day_row = header_row + 1
-        day_cell = worksheet.cell(row=day_row, column=date_col)
-        day_cell.value = day_name
-        day_cell.font = Font(bold=True)
-        day_cell.alignment = Alignment(horizontal='center')
-        day_cell.border = thin_border
-        
-        # Apply fill to day cell
-        if current_fill:
-            day_cell.fill = current_fill
-        
-        next_day_cell = worksheet.cell(row=day_row, column=date_col+1)
-        next_day_cell.border = thin_border
-        if current_fill:
-            next_day_cell.fill = current_fill
-        
-        # Merge day cells
-        worksheet.merge_cells(start_row=day_row, start_column=date_col, 
-                             end_row=day_row, end_column=date_col+1)
-        
-        # AM/PM headers
-        am_pm_row = header_row + 2
-        am_cell = worksheet.cell(row=am_pm_row, column=date_col)
-        pm_cell = worksheet.cell(row=am_pm_row, column=date_col+1)
-        
-        am_cell.value = "AM"
-        pm_cell.value = "PM"
-        
-        # Style AM/PM headers
-        am_cell.font = Font(bold=True)
-        pm_cell.font = Font(bold=True)
-        am_cell.alignment = Alignment(horizontal='center')
-        pm_cell.alignment = Alignment(horizontal='center')
-        am_cell.border = thin_border
-        pm_cell.border = thin_border
-        
-        # Apply fill to AM/PM cells
-        if current_fill:
-            am_cell.fill = current_fill
-            pm_cell.fill = current_fill
-    
-    # Employee data row height (approximately 45 pixels = 75.00 points)
-    row_height = 45
-    
-    # Clear any existing data and write employee data starting from row 6
-    employee_start_row = header_row + 3  # This is row 6 in the worksheet
-    
-    # Write employee data
-    for i, row in df.iterrows():
-        # Set row height for employee rows
-        worksheet.row_dimensions[employee_start_row + i].height = row_height
-        
-        # Write ID and Name
-        id_cell = worksheet.cell(row=employee_start_row + i, column=1)
-        name_cell = worksheet.cell(row=employee_start_row + i, column=2)
-        
-        id_cell.value = row.get('Employee No.', '')
-        name_cell.value = row.get(df.columns[1], '') if len(df.columns) > 1 else ''
-        
-        # Format ID and NAME cells
-        id_cell.alignment = Alignment(horizontal='center')
-        name_cell.alignment = Alignment(horizontal='left')
-        id_cell.border = thin_border
-        name_cell.border = thin_border
-        
-        
-        # Write time entries
-        for date_idx, date_str in enumerate(unique_dates):
-            # Find the corresponding columns in the DataFrame
-            am_col = next((col for col in df.columns if date_str in col and "Time In" in col), None)
-            pm_col = next((col for col in df.columns if date_str in col and "Time Out" in col), None)
-            
-            if am_col and pm_col:
-                am_value = row.get(am_col, '')
-                pm_value = row.get(pm_col, '')
-                
-                # Write values
-                am_cell = worksheet.cell(row=employee_start_row + i, column=start_col + date_idx*2)
-                pm_cell = worksheet.cell(row=employee_start_row + i, column=start_col + date_idx*2 + 1)
-                am_cell.value = am_value  
-                pm_cell.value = pm_value
-            
-                
-                # Center align the time cells and add borders
-                am_cell.alignment = Alignment(horizontal='center', vertical='center')
-                pm_cell.alignment = Alignment(horizontal='center', vertical='center')
-                am_cell.border = thin_border
-                pm_cell.border = thin_border
-                
-    
-    # Create frozen panes to keep headers and ID/Name columns visible when scrolling
-    # Freeze panes at cell C6 (row 6, column 3)
-    worksheet.freeze_panes = 'C6'
-    
-    
-def filter_in_out_entries(df):
-    # Check if dataframe is None or empty
-    if df is None or len(df) == 0:
-        print("Warning: Empty or None DataFrame provided to filter_in_out_entries")
-        return pd.DataFrame()  # Return empty DataFrame instead of None
-        
-    # Validate input DataFrame
-    if df.shape[1] < 2:
-        return df  # Return original if insufficient columns
-
-    # Identify columns
-    first_col = df.columns[0]  # Employee Name column
-    time_col = df.columns[1]  # Timestamp column
-
-    # Convert timestamp and extract date and time
-    df[time_col] = pd.to_datetime(df[time_col], errors='coerce')
-    df['Date'] = df[time_col].dt.strftime('%Y-%m-%d')
-    df['Time'] = df[time_col].dt.strftime('%H:%M:%S')
-    df['Hour'] = df[time_col].dt.hour
-
-    # Group logs by employee and date
-    grouped = df.groupby([first_col, 'Date'])['Time'].agg(list).reset_index()
-    
-    # Add Hours column for processing
-    grouped['Hours'] = grouped.apply(
-        lambda row: df[(df[first_col] == row[first_col]) & (df['Date'] == row['Date'])]['Hour'].tolist(),
-        axis=1
+    schedules = {row[0]: row for row in schedules}
+    schedules.setdefault(DEFAULT_SCHEDULE[0], DEFAULT_SCHEDULE)
+    schedule_ids = pd.Index(list(schedules))
+    rows = [schedules[schedule_id] for schedule_id in schedule_ids]
+
+    compiled = {}
+    for position, key in enumerate(["start", "end", "lunch_out", "lunch_in", "required", "split", "cutoff"], start=2):
+        compiled[key] = np.array([np.nan if row[position] is None else row[position] for row in rows])
+
+    # Times before the start of the shift fall on the next day
+    start = compiled["start"]
+    for key in ("end", "lunch_out", "lunch_in", "split"):
+        compiled[key] = np.where(compiled[key] < start, compiled[key] + 1440, compiled[key])
+    compiled["end"] = np.where(compiled["end"] == start, start + 1440, compiled["end"])
+
+    # Schedules without a lunch break have no default lunch punches
+    has_lunch = ~np.isnan(compiled["lunch_out"]) & ~np.isnan(compiled["lunch_in"])
+    compiled["lunch"] = np.where(has_lunch, compiled["lunch_in"] - compiled["lunch_out"], 0)
+    for key in ("lunch_out", "lunch_in"):
+        compiled[f"{key}_text"] = np.array(
+            [minute_text(int(m)) if ok else "" for m, ok in zip(compiled[key], has_lunch)], dtype=object)
+    compiled["hours_text"] = np.array(
+        [f"{minute_text(row[2], True)} - {minute_text(row[3], True)}" for row in rows], dtype=object)
+
+    # Employees by weekday, unassigned weekdays and employees use the default
+    default_code = schedule_ids.get_loc(DEFAULT_SCHEDULE[0])
+    assignments = [row for row in assignments if row[2] in schedules and 0 <= row[1] < 7]
+    compiled["employees"] = pd.Index(sorted({row[0] for row in assignments}))
+    compiled["table"] = np.full((len(compiled["employees"]) + 1, 7), default_code, dtype=np.int64)
+    for employee_id, weekday, schedule_id in assignments:
+        compiled["table"][compiled["employees"].get_loc(employee_id), weekday] = schedule_ids.get_loc(schedule_id)
+    compiled["default"] = default_code
+    return compiled
+
+# Compiled work schedules of the current run, see load_work_schedules
+work_schedules = compile_work_schedules([], [])
+
+def load_work_schedules():
+    global work_schedules
+    conn = sqlite3.connect("conversion_history.db")
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT id, name, start_minute, end_minute, lunch_out_minute, lunch_in_minute,
+               required_minutes, split_minute, day_cutoff_minute
+        FROM schedules
+    """)
+    schedules = cursor.fetchall()
+    cursor.execute("SELECT employee_id, weekday, schedule_id FROM employee_schedules")
+    assignments = cursor.fetchall()
+    conn.close()
+    work_schedules = compile_work_schedules(schedules, assignments)
+
+def employee_numbers(names):
+    # Employee numbers of a name column, unknown employees are named after their raw ID
+    names = names.astype(object)
+    name_to_id = {v: k for k, v in employee_list.items()}
+    return names.map(name_to_id).fillna(pd.to_numeric(names, errors="coerce"))
+
+def schedule_codes(names, weekdays):
+    """
+    Looks up the schedule code of every (employee, weekday) pair in the
+    compiled work_schedules. Names are factorized first so the employee
+    number lookup only runs once per distinct employee.
+    """
+    codes, unique_names = pd.factorize(names)
+    employee_rows = work_schedules["employees"].get_indexer(employee_numbers(pd.Series(unique_names)))
+    # Unassigned employees get -1, the default row at the end of the table
+    return work_schedules["table"][employee_rows[codes], weekdays]
+
+def work_dates(names, timestamps):
+    # Punches before the day cutoff of the previous day's schedule belong to that day's shift
+    dates = timestamps.dt.normalize()
+    minutes = (timestamps.dt.hour * 60 + timestamps.dt.minute).to_numpy()
+    previous = schedule_codes(names, ((timestamps.dt.weekday - 1) % 7).to_numpy())
+    overnight = minutes < work_schedules["cutoff"][previous]
+    return dates.where(~overnight, dates - pd.Timedelta(days=1))
+
+def load_holidays():
+    conn = sqlite3.connect("conversion_history.db")
+    cursor = conn.cursor()
+    cursor.execute("SELECT date, kind FROM holidays")
+    rows = cursor.fetchall()
+    conn.close()
+    holiday_list.clear()
+    holiday_list.update({date: kind.upper() for date, kind in rows})
+    month_calendar.cache_clear()
+
+MonthCalendar = namedtuple("MonthCalendar", [
+    "month", "title", "range_text", "dates", "weekdays", "date_texts", "header_texts",
+    "day_names", "day_labels", "day_styles", "holidays", "positions"
+])
+
+@lru_cache(maxsize=None)
+def month_calendar(month):
+    """
+    The calendar of a month (a pd.Period) shared by the sessionization, the
+    summary sheet and the DTR sheets: its dates with their weekday codes,
+    texts and header fills, and the holiday or suspension of every date
+    ("" on other days). Built once per month in each process.
+    """
+    dates = pd.date_range(month.start_time, month.end_time.normalize())
+    date_texts = list(dates.strftime("%Y-%m-%d"))
+    day_names = list(dates.strftime("%a").str.upper())
+    return MonthCalendar(
+        month=month,
+        title=month.strftime("%B %Y"),  # Example: "January 2025"
+        range_text=f"{month.strftime('%B')} 1-{len(dates)}, {month.year}",
+        dates=dates,
+        weekdays=dates.weekday.to_numpy(),
+        date_texts=date_texts,
+        header_texts=list(dates.strftime("%d/%m/%Y")),
+        day_names=day_names,
+        day_labels=[f"{text} ({name})" for text, name in zip(date_texts, dates.strftime("%A"))],
+        day_styles=[f"DTR Day {name}" for name in day_names],
+        holidays=np.array([holiday_list.get(text, "") for text in date_texts], dtype=object),
+        positions={text: position for position, text in enumerate(date_texts)}
     )
-    
-    # Define the process_daily_logs function for determining time-in and time-out
-    def process_daily_logs(times, hours):
-        # Handle empty list case
-        if not times or not hours:
-            return None, None  # This will become NaN when processed by pandas
-            
-        # Sort times to ensure chronological order
-        sorted_logs = sorted(zip(times, hours), key=lambda x: x[1])
-        
-        if len(sorted_logs) == 1:
-            # Single log handling
-            time, hour = sorted_logs[0]
-            if hour < 12:
-                return time, "No Out"
-            else:
-                return "No In", time
-        else:
-            # Group logs by hour to detect duplicates
-            hour_groups = {}
-            for time, hour in sorted_logs:
-                if hour not in hour_groups:
-                    hour_groups[hour] = []
-                hour_groups[hour].append(time)
-            
-            # Keep only the latest log for each hour
-            filtered_logs = []
-            for hour, time_logs in hour_groups.items():
-                # Add the latest log from each hour group
-                filtered_logs.append((sorted(time_logs)[-1], hour))
-            
-            # Re-sort after filtering
-            filtered_logs.sort(key=lambda x: x[1])
-            
-            # If we have only one log after filtering
-            if len(filtered_logs) == 1:
-                time, hour = filtered_logs[0]
-                if hour < 12:
-                    return time, "No Out"
-                else:
-                    return "No In", time
-                    
-            # If we have multiple logs after filtering
-            return filtered_logs[0][0], filtered_logs[-1][0]
 
-    # Apply log processing with error handling
-    try:
-        grouped[['Time In', 'Time Out']] = grouped.apply(
-            lambda row: pd.Series(process_daily_logs(row['Time'], row['Hours'])), 
-            axis=1
-        )
-    except Exception as e:
-        print(f"Error processing daily logs: {e}")
-        # Provide default values to avoid None
-        grouped['Time In'] = ''
-        grouped['Time Out'] = ''
-    
-    grouped = grouped.drop(columns=['Time', 'Hours'])
+def summary_time_columns(df):
+    """
+    Maps each date of the summary table to the positions of its Time In and
+    Time Out columns (None when missing), in date order. Built once so the
+    employee rows are written without searching the columns.
+    """
+    time_columns = {}
+    for position, col in enumerate(df.columns):
+        if " (" in col and ("Time In" in col or "Time Out" in col):
+            status = "Time In" if "Time In" in col else "Time Out"
+            time_columns.setdefault(col.split(" (")[0], {}).setdefault(status, position)
+
+    return [(date_str, time_columns[date_str].get("Time In"), time_columns[date_str].get("Time Out"))
+            for date_str in sorted(time_columns)]
+
+def summary_rows(df):
+    # (ID, name, time values) per employee, read from plain tuples
+    id_position = df.columns.get_loc('Employee No.') if 'Employee No.' in df.columns else None
+    for values in df.itertuples(index=False, name=None):
+        employee_id = values[id_position] if id_position is not None else ''
+        name = values[1] if len(values) > 1 else ''
+        yield employee_id, name, values
+
+def write_dtr_summary_sheet(writer, df, calendar):
+    # Every summary cell is written once, straight in its final format
+    worksheet = writer.book.create_sheet(f"DTR - {calendar.title}")
+    register_cell_styles(writer.book)
+    write_sheet_layout(worksheet, build_summary_layout(df, calendar))
+    
+def sessionize_punches(df, month):
+    """
+    Interprets the punches of one month once for every employee-day: arrival,
+    departure, default lunch punches, status and undertime. The summary sheet
+    and the individual DTR sheets are both rendered from this table.
+    """
+    calendar = month_calendar(pd.Period(month, freq="M"))
+    month = calendar.month
+    work_date = work_dates(df["Name"], df["Timestamp"])
+    in_month = (work_date >= month.start_time) & (work_date <= month.end_time)
+    if not in_month.any():
+        return pd.DataFrame()
+
+    # Repeat punches were dropped when the DAT file was loaded (suppress_duplicate_punches)
+    punches = pd.DataFrame({
+        "Name": df["Name"][in_month],
+        "Date": work_date[in_month],
+        "Timestamp": df["Timestamp"][in_month]
+    })
+
+    # Arrival is the first log before the schedule's in/out split and
+    # departure the last log from the split on, in minutes of the work day
+    minute = ((punches["Timestamp"] - punches["Date"]) // pd.Timedelta(minutes=1)).to_numpy()
+    split = work_schedules["split"][schedule_codes(punches["Name"], punches["Date"].dt.weekday.to_numpy())]
+    morning = minute < split
+    punches["Morning"] = punches["Timestamp"].where(morning)
+    punches["Afternoon"] = punches["Timestamp"].where(~morning)
+    days = punches.groupby(["Name", "Date"], observed=True).agg(
+        Arrival=("Morning", "min"),
+        Departure=("Afternoon", "max"),
+        Logs=("Timestamp", "size")
+    )
 
-    # Generate full date range for the month
-    if not df.empty:
-        min_date = pd.to_datetime(df['Date'].min())
-        max_date = pd.to_datetime(df['Date'].max())
-        
-        # Get first and last day of the month
-        year, month = min_date.year, min_date.month
-        first_day = datetime(year, month, 1)
-        if month == 12:
-            last_day = datetime(year + 1, 1, 1) - timedelta(days=1)
-        else:
-            last_day = datetime(year, month + 1, 1) - timedelta(days=1)
-        
-        all_dates = pd.date_range(first_day, last_day).strftime('%Y-%m-%d')
+    # One row for every employee and every day of the month
+    all_employees = punches["Name"].unique()
+    full_index = pd.MultiIndex.from_product([all_employees, calendar.dates], names=["Name", "Date"])
+    days = days.reindex(full_index).reset_index()
+    days["Logs"] = days["Logs"].fillna(0).astype(int)
+
+    # Schedule, default lunch break and day status, holidays are never absences
+    has_logs = days["Logs"] > 0
+    weekday = days["Date"].dt.weekday
+    holiday = calendar.holidays[(days["Date"].dt.day - 1).to_numpy()]
+    schedule = schedule_codes(days["Name"], weekday.to_numpy())
+    days["Weekday"] = weekday
+    days["Schedule"] = schedule
+    days["LunchOut"] = np.where(has_logs, work_schedules["lunch_out_text"][schedule], "")
+    days["LunchIn"] = np.where(has_logs, work_schedules["lunch_in_text"][schedule], "")
+    days["Status"] = np.select(
+        [weekday == 5, weekday == 6, holiday != "", ~has_logs],
+        ["SATURDAY", "SUNDAY", holiday, "ABSENT"],
+        default=""
+    )
 
-        # Create full index for all employees and dates
-        all_employees = df[first_col].unique()
-        full_index = pd.MultiIndex.from_product([all_employees, all_dates], names=[first_col, 'Date'])
-        
-        # Try/except to handle potential errors during reindexing
-        try:
-            grouped = grouped.set_index([first_col, 'Date']).reindex(full_index).reset_index()
-        except Exception as e:
-            print(f"Error during reindexing: {e}")
-            # If reindexing fails, continue with the grouped data we have
-            if not isinstance(grouped, pd.DataFrame) or grouped.empty:
-                return pd.DataFrame()  # Return empty DataFrame if grouped is None or empty
-
-    # Determine day of the week
-    grouped['DayOfWeek'] = grouped['Date'].apply(lambda x: pd.to_datetime(x).strftime('%A') if pd.notna(x) else '')
-
-    # Mark absences and weekend days
-    def mark_absences(row):
-        if pd.isna(row['Time In']) and pd.isna(row['Time Out']):
-            if row['DayOfWeek'] == 'Saturday':
-                return "Saturday", "Saturday"
-            elif row['DayOfWeek'] == 'Sunday':
-                return "Sunday", "Sunday"
-            else:
-                return "Absent", "Absent"
-        return row['Time In'], row['Time Out']
+    # Lateness, early departure and undertime in whole minutes, only for
+    # regular working days. Undertime needs both punches and adds the lateness
+    # and early departure to the shortfall of the required work time.
+    regular = (days["Status"] == "").to_numpy()
+    arrival = ((days["Arrival"] - days["Date"]) // pd.Timedelta(minutes=1)).to_numpy()
+    departure = ((days["Departure"] - days["Date"]) // pd.Timedelta(minutes=1)).to_numpy()
+    with np.errstate(invalid="ignore"):
+        late = np.maximum(arrival - work_schedules["start"][schedule], 0)
+        early = np.maximum(work_schedules["end"][schedule] - departure, 0)
+        worked = departure - arrival - work_schedules["lunch"][schedule]
+        undertime = np.maximum(work_schedules["required"][schedule] - worked, 0) + late + early
+    days["LateMinutes"] = np.where(regular & ~np.isnan(late), late, 0).astype(np.int64)
+    days["EarlyMinutes"] = np.where(regular & ~np.isnan(early), early, 0).astype(np.int64)
+    days["UndertimeMinutes"] = np.where(regular & ~np.isnan(undertime), undertime, 0).astype(np.int64)
+
+    return days
+
+def format_minutes(minutes):
+    # "HH:MM" text of a Series of whole minutes, empty where there are none
+    text = (minutes // 60).map("{:02}".format) + ":" + (minutes % 60).map("{:02}".format)
+    return text.where(minutes > 0, "")
+
+def filter_in_out_entries(days):
+    """
+    Pivots the sessionized employee-days into the summary sheet table,
+    one row per employee with a Time In and Time Out column per date
+    """
+    # Check if dataframe is None or empty
+    if days is None or len(days) == 0:
+        print("Warning: Empty or None DataFrame provided to filter_in_out_entries")
+        return pd.DataFrame()  # Return empty DataFrame instead of None
+
+    first_col = "Name"
+    has_logs = days["Logs"] > 0
+    calendar = month_calendar(days["Date"].iloc[0].to_period("M"))
 
-    grouped[['Time In', 'Time Out']] = grouped.apply(mark_absences, axis=1, result_type="expand")
+    # Times for days with logs, the day status (Absent, Saturday, Holiday...) for days without any
+    absence_labels = days["Status"].str.capitalize()
+    grouped = pd.DataFrame({
+        first_col: days["Name"].astype(object),
+        "Date": np.array(calendar.date_texts, dtype=object)[(days["Date"].dt.day - 1).to_numpy()],
+        "Time In": days["Arrival"].dt.strftime('%H:%M:%S').fillna("No In").where(has_logs, absence_labels),
+        "Time Out": days["Departure"].dt.strftime('%H:%M:%S').fillna("No Out").where(has_logs, absence_labels)
+    })
 
     # Add Employee No. mapping (assuming employee_list is defined elsewhere)
     try:
@@ -433,49 +522,1015 @@ def filter_in_out_entries(df):
     try:
         result = grouped.pivot(index=['Employee No.', first_col], columns='Date', values=['Time In', 'Time Out'])
         result = result.swaplevel(axis=1).sort_index(axis=1, level=0)
-        result.columns = [f"{date} ({datetime.strptime(date, '%Y-%m-%d').strftime('%A')}) {status}" 
-                        for date, status in result.columns]
+        result.columns = [f"{calendar.day_labels[calendar.positions[date]]} {status}"
+                          for date, status in result.columns]
         return result.reset_index().sort_values(by="Employee No.").reset_index(drop=True)
     except Exception as e:
         print(f"Error during pivot operation: {e}")
         # If pivot fails, return the grouped data as is
         return grouped
 
-def convert_batch_to_excel(files):
-    for dat_file in files:
+def payroll_table(days):
+    """
+    The sessionized employee-days as payroll needs them: employee number,
+    date, arrival, departure and undertime minutes, without any formatting
+    """
+    employee_no = employee_numbers(days["Name"]).fillna(0)
+
+    table = pd.DataFrame({
+        "Employee No.": employee_no.astype(np.int64).to_numpy(),
+        "Date": days["Date"].to_numpy(),
+        "Arrival": days["Arrival"].to_numpy(),
+        "Departure": days["Departure"].to_numpy(),
+        "Undertime Minutes": days["UndertimeMinutes"].to_numpy()
+    })
+    return table.sort_values(["Employee No.", "Date"], kind="stable").reset_index(drop=True)
+
+def write_payroll_export(dat_file, csv_path, months=None):
+    """
+    Fast payroll feed of a DAT file: the payroll table of every month (or of
+    months, see dat_file_months) as a CSV file and as a compressed .npz of
+    typed columns next to it. Returns both paths.
+    """
+    partitions, _ = load_dat_punches(dat_file, dat_file_months(dat_file, months))
+    tables = []
+    for month, month_df in partitions.items():
+        days = sessionize_punches(month_df, month)
+        save_monthly_attendance(days, month, os.path.basename(dat_file))
+        tables.append(payroll_table(days))
+    table = pd.concat(tables, ignore_index=True)
+
+    # Times of day in the CSV, missing punches left empty
+    pd.DataFrame({
+        "Employee No.": table["Employee No."],
+        "Date": table["Date"].dt.strftime("%Y-%m-%d"),
+        "Arrival": table["Arrival"].dt.strftime("%H:%M:%S"),
+        "Departure": table["Departure"].dt.strftime("%H:%M:%S"),
+        "Undertime Minutes": table["Undertime Minutes"]
+    }).to_csv(csv_path, index=False)
+
+    # Binary columns for loading without parsing, missing punches are NaT
+    npz_path = os.path.splitext(csv_path)[0] + ".npz"
+    np.savez_compressed(
+        npz_path,
+        employee_no=table["Employee No."].to_numpy(),
+        date=table["Date"].to_numpy().astype("datetime64[D]"),
+        arrival=table["Arrival"].to_numpy().astype("datetime64[s]"),
+        departure=table["Departure"].to_numpy().astype("datetime64[s]"),
+        undertime_minutes=table["Undertime Minutes"].to_numpy()
+    )
+    return csv_path, npz_path
+
+def monthly_attendance(days):
+    """
+    Per-employee totals of the sessionized month, as shown on the DTR: days
+    with logs, absences, No In/No Out days, Saturdays worked and undertime
+    """
+    has_logs = days["Logs"] > 0
+    totals = pd.DataFrame({
+        "Name": days["Name"].astype(object),
+        "DaysPresent": has_logs,
+        "Absences": days["Status"] == "ABSENT",
+        "NoIn": has_logs & days["Arrival"].isna(),
+        "NoOut": has_logs & days["Departure"].isna(),
+        "Saturdays": has_logs & (days["Weekday"] == 5),
+        "UndertimeMinutes": days["UndertimeMinutes"]
+    }).groupby("Name", sort=False).sum().astype(np.int64).reset_index()
+    totals.insert(1, "EmployeeNo", employee_numbers(totals["Name"]))
+    return totals
+
+def save_monthly_attendance(days, month, source):
+    # Replaces the month's totals from this source, so reconverting a file refreshes
+    # them and drops employees that were renamed or are no longer in it
+    if days.empty:
+        return
+    totals = monthly_attendance(days)
+    month = str(pd.Period(month, freq="M"))
+    converted_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    conn = sqlite3.connect("conversion_history.db")
+    with conn:
+        conn.execute("DELETE FROM monthly_attendance WHERE month = ? AND source = ?", (month, source))
+        conn.executemany(
+            "INSERT OR REPLACE INTO monthly_attendance VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(month, name, None if pd.isna(employee_no) else int(employee_no), *map(int, counts), source, converted_at)
+             for name, employee_no, *counts in totals.itertuples(index=False)]
+        )
+    conn.close()
+
+def load_cached_punches(entry):
+    cache_path = os.path.join(DAT_CACHE_DIR, f"{entry}.npz")
+    if not os.path.exists(cache_path):
+        return None
+
+    try:
+        with np.load(cache_path, allow_pickle=False) as cached:
+            df = pd.DataFrame({"Name": cached["ids"], "Timestamp": cached["timestamps"]})
+    except Exception as e:
+        print(f"Warning: Ignoring unreadable cache entry {cache_path}: {e}")
+        return None
+
+    # Mark the entry as recently used for eviction, another process may have just evicted it
+    try:
+        os.utime(cache_path)
+    except OSError:
+        pass
+    return df
+
+def save_cached_punches(entry, df):
+    # The cache is only an optimization: a full disk or an entry another
+    # worker holds open skips the write instead of failing the conversion
+    cache_path = os.path.join(DAT_CACHE_DIR, f"{entry}.npz")
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+
+    # Text IDs are stored as fixed-width strings so loading never needs pickle
+    ids = df["Name"].to_numpy()
+    if ids.dtype == object:
+        ids = ids.astype(str)
+
+    try:
+        os.makedirs(DAT_CACHE_DIR, exist_ok=True)
+        with open(temp_path, 'wb') as file:
+            np.savez_compressed(
+                file,
+                ids=ids,
+                timestamps=df["Timestamp"].to_numpy()
+            )
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        print(f"Warning: Could not write cache entry {cache_path}: {e}")
         try:
-            df = pd.read_csv(dat_file, delimiter="\t", header=None)
+            os.remove(temp_path)
+        except OSError:
+            pass
+        return False
+
+    evict_dat_cache()
+    return True
+
+def evict_dat_cache(max_bytes=DAT_CACHE_MAX_BYTES):
+    # Drop the least recently used entries until the cache fits. Worker
+    # processes evict concurrently, so entries may vanish while we look.
+    entries = []
+    try:
+        for entry in os.scandir(DAT_CACHE_DIR):
+            if entry.name.endswith(".npz"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+    except OSError as e:
+        print(f"Warning: Could not scan the DAT cache: {e}")
+        return
 
-            if df.empty:
-                messagebox.showerror("Error", f"The file {dat_file} is empty.")
-                return
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError as e:
+            print(f"Warning: Could not evict cache entry {path}: {e}")
+
+def complete_lines_end(dat_file, size):
+    # Offset just past the last newline, where the next read resumes so a line still being written is parsed again
+    with open(dat_file, 'rb') as file:
+        end = size
+        while end > 0:
+            start = max(0, end - 64 * 1024)
+            file.seek(start)
+            newline = file.read(end - start).rfind(b'\n')
+            if newline != -1:
+                return start + newline + 1
+            end = start
+    return 0
+
+def parse_dat_chunk(data):
+    # ID and timestamp columns of a block of whole DAT lines, with the number of lines in it
+    try:
+        # Only the ID and timestamp columns are used, the rest are never parsed
+        chunk = pd.read_csv(io.BytesIO(data), delimiter="\t", header=None, usecols=[0, 1])
+    except pd.errors.EmptyDataError:
+        return pd.DataFrame(columns=["Name", "Timestamp"]), 0
+    except ValueError as e:
+        if "Usecols" in str(e):
+            raise ValueError("DAT file must have at least two columns (ID and Timestamp).")
+        raise
+
+    rows_read = len(chunk)
+    chunk.columns = ["Name", "Timestamp"]
+    chunk["Timestamp"] = pd.to_datetime(chunk["Timestamp"], errors="coerce")
+    return chunk.dropna(subset=["Timestamp"]), rows_read  # Remove invalid timestamps
+
+def read_dat_chunks(file, start, end, digest):
+    """
+    Yields the whole lines of a DAT file between two byte offsets in bounded
+    chunks, as (offset after the chunk, bytes). Every chunk handed out is
+    added to digest, so it always covers the file up to that offset.
+    """
+    file.seek(start)
+    position = start
+    pending = b""
+    while position < end:
+        data = file.read(min(DAT_CHUNK_BYTES, end - position))
+        if not data:
+            break
+        position += len(data)
+        data = pending + data
+
+        # Cut after the last complete line, end itself is always a line end
+        cut = len(data) if position >= end else data.rfind(b"\n") + 1
+        pending = data[cut:]
+        if cut:
+            digest.update(data[:cut])
+            yield position - len(pending), data[:cut]
+
+def hash_dat_range(file, start, end, digest):
+    file.seek(start)
+    while start < end:
+        block = file.read(min(1024 * 1024, end - start))
+        if not block:
+            break
+        digest.update(block)
+        start += len(block)
+
+def month_entry_name(month, digest):
+    # Cache entry of one month, named after the file content it was parsed from, so
+    # older states and copies of the file never see it change under them
+    return f"{digest.copy().hexdigest()[:32]}-{month}"
+
+def resume_dat_source(path, file, end):
+    """
+    The processed state of a DAT file as (offset, lines read, month entries,
+    digest of the bytes up to offset, whether the state is the path's own).
+    A known path whose processed
+    part is byte-for-byte unchanged resumes where it stopped. Otherwise a
+    file with the content of one processed before (a copy, or a re-export)
+    reuses its months. Anything else starts from byte 0.
+    """
+    conn = sqlite3.connect("conversion_history.db")
+    cursor = conn.cursor()
+    cursor.execute("SELECT offset, prefix_checksum, rows_read FROM dat_sources WHERE path = ?", (path,))
+    source = cursor.fetchone()
+
+    digest = hashlib.sha256()
+    if source is not None and source[0] <= end:
+        hash_dat_range(file, 0, source[0], digest)
+    own = source is not None and source[0] <= end and digest.hexdigest() == source[1]
+    if not own:
+        # The whole file's checksum matches a processed prefix of the same content
+        digest = hashlib.sha256()
+        hash_dat_range(file, 0, end, digest)
+        cursor.execute("SELECT offset, prefix_checksum, rows_read FROM dat_sources WHERE prefix_checksum = ? LIMIT 1",
+                       (digest.hexdigest(),))
+        source = cursor.fetchone()
+
+    if source is None:
+        conn.close()
+        return 0, 0, {}, hashlib.sha256(), False
 
-            if df.shape[1] < 2:
-                messagebox.showerror("Error", "DAT file must have at least two columns (ID and Timestamp).")
-                return
+    cursor.execute("SELECT month, entry FROM dat_source_months WHERE checksum = ?", (source[1],))
+    entries = {pd.Period(month, freq="M"): entry for month, entry in cursor.fetchall()}
+    conn.close()
+    return source[0], source[2], entries, digest, own
+
+def save_dat_source(path, size, offset, rows_read, entries, checksum):
+    # Records how far the file was processed and the cache entry of each of its months
+    conn = sqlite3.connect("conversion_history.db")
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO dat_sources (path, size, offset, prefix_checksum, rows_read, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (path, size, offset, checksum, rows_read, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        )
+        conn.executemany("INSERT OR REPLACE INTO dat_source_months (checksum, month, entry) VALUES (?, ?, ?)",
+                         [(checksum, str(month), entry) for month, entry in entries.items()])
+
+        # Replaced states are dropped once no file has that content any more,
+        # along with the cache entries only they used
+        replaced = """
+            FROM dat_source_months WHERE NOT EXISTS
+            (SELECT 1 FROM dat_sources WHERE dat_sources.prefix_checksum = dat_source_months.checksum)
+        """
+        unused = {entry for entry, in conn.execute("SELECT entry " + replaced)}
+        conn.execute("DELETE " + replaced)
+        unused -= {entry for entry, in conn.execute("SELECT entry FROM dat_source_months")}
+    conn.close()
+
+    for entry in unused:
+        try:
+            os.remove(os.path.join(DAT_CACHE_DIR, f"{entry}.npz"))
+        except OSError:
+            pass
+
+def read_dat_file(dat_file, months=None, select=None):
+    """
+    Returns the punches of a DAT file as (punches, lines read, month entries).
+
+    The parsed punches are cached per calendar month. When the part of the
+    file processed before is unchanged, only the bytes after it are parsed
+    and only the months they touch are rewritten. month entries maps every
+    month of the file to its cache entry, which changes whenever the month's
+    punches do.
+
+    With months only their punches are loaded, plus the first day after
+    them when night shifts need it, and since terminals append punches in
+    order, reading stops at the first chunk past them. select is a function
+    that then picks the months to load among them from the month entries,
+    once the months read have been brought up to date.
+
+    A last line without a newline is parsed on every read but never cached,
+    as it may still be being written; the months it falls in get an entry
+    of their own.
+    """
+    path = os.path.abspath(dat_file)
+    size = os.path.getsize(path)
+    end = complete_lines_end(path, size)
+
+    # A month entry that went missing (evicted, or another process failed to
+    # write it) makes the stored state useless, so the file is read afresh
+    result = read_dat_source(path, size, end, months, select, resume=True)
+    if result is None:
+        result = read_dat_source(path, size, end, months, select, resume=False)
+    return result
+
+def needed_months(months):
+    # The months to load for the requested ones and the day after them that
+    # night shifts reach into (limit), None standing for every month
+    if months is None:
+        return None, None
+    months = {pd.Period(month, freq="M") for month in months}
+    if not months:
+        return set(), None
+    limit = (max(months) + 1).start_time
+    if (work_schedules["cutoff"] > 0).any():
+        limit += pd.Timedelta(days=1)
+        months |= {month + 1 for month in months}
+    return months, limit
+
+def read_dat_source(path, size, end, months, select, resume):
+    needed, limit = needed_months(months)
+
+    with open(path, 'rb') as file:
+        if resume:
+            offset, rows_read, entries, digest, own = resume_dat_source(path, file, end)
+        else:
+            offset, rows_read, entries, digest, own = 0, 0, {}, hashlib.sha256(), False
+        start = offset
+
+        kept = {}  # Months of this run that are needed or could not be cached
+        pending = {}
+        written = True
+
+        def flush(month):
+            # Merges a month's new punches into its cached ones and caches the result
+            nonlocal written
+            frames = pending.pop(month)
+            if month in entries:
+                cached = load_cached_punches(entries[month])
+                if cached is None:
+                    return False
+                frames.insert(0, cached)
+            punches = pd.concat(frames, ignore_index=True)
+            entry = month_entry_name(month, digest)
+            saved = save_cached_punches(entry, punches)
+            if saved:
+                entries[month] = entry
+            else:
+                written = False
+            if not saved or select is None and (needed is None or month in needed):
+                kept[month] = punches
+            return True
+
+        # Cached months past the requested ones mean those are complete already
+        complete = limit is not None and entries and max(entries).start_time >= limit
+        if not complete:
+            for chunk_end, data in read_dat_chunks(file, offset, end, digest):
+                chunk, lines = parse_dat_chunk(data)
+                offset = chunk_end
+                rows_read += lines
+                if chunk.empty:
+                    continue
+
+                for month, punches in chunk.groupby(chunk["Timestamp"].dt.to_period("M")):
+                    pending.setdefault(month, []).append(punches)
+
+                # Months before this chunk are complete, caching them now keeps memory flat
+                first = chunk["Timestamp"].min()
+                for month in [month for month in pending if month < first.to_period("M")]:
+                    if not flush(month):
+                        return None
+
+                if limit is not None and first >= limit:
+                    break
+
+            for month in list(pending):
+                if not flush(month):
+                    return None
+
+        # The bytes after the last newline, parsed for this read only. The state
+        # is saved up to end, so the line is parsed again once it is complete.
+        tail = pd.DataFrame(columns=["Name", "Timestamp"])
+        tail_checksum = None
+        tail_lines = 0
+        if offset == end < size:
+            file.seek(end)
+            data = file.read(size - end)
+            try:
+                tail, tail_lines = parse_dat_chunk(data)
+            except ValueError:
+                tail_lines = 1  # Only the ID of the punch has been written so far
+            tail_checksum = hashlib.sha256(data).hexdigest()[:16]
+
+    # A file that reuses another one's months is recorded as a source of its own
+    if written and (offset > start or (offset > 0 and not own)):
+        save_dat_source(path, size, offset, rows_read, entries, digest.hexdigest())
+
+    # Months that could not be cached are still converted, without an entry
+    tail_months = pd.to_datetime(tail["Timestamp"]).dt.to_period("M")
+    cached = {month: entries.get(month) for month in sorted(set(entries) | set(kept) | set(tail_months))}
+    entries = dict(cached)
+    tail_months = tail_months.to_numpy()
+    for month in set(tail_months):
+        if month not in kept or entries[month] is not None:
+            entries[month] = f"{entries[month] or ''}+{tail_checksum}"
+    if select is not None:
+        needed, limit = needed_months(select(dict(entries)))
+
+    # The requested months, from this run or from the cache, and the last line
+    frames = []
+    for month in entries:
+        if needed is not None and month not in needed:
+            continue
+        punches = kept.get(month)
+        if punches is None and cached[month] is not None:
+            punches = load_cached_punches(cached[month])
+            if punches is None:
+                return None
+        if punches is not None:
+            frames.append(punches)
+        if (tail_months == month).any():
+            frames.append(tail[tail_months == month])
+
+    if limit is not None:
+        frames = [punches[punches["Timestamp"] < limit] for punches in frames]
+
+    if not frames:
+        return pd.DataFrame(columns=["Name", "Timestamp"]), rows_read + tail_lines, entries
+    return pd.concat(frames, ignore_index=True), rows_read + tail_lines, entries
+
+def resolve_employee_names(ids):
+    """
+    Resolves biometric IDs to employee names in one vectorized pass. IDs are
+    factorized first so the employee_list join only runs once per distinct ID,
+    and the names come back as a categorical column.
+    """
+    codes, unique_ids = pd.factorize(ids, use_na_sentinel=False)
+    unique_ids = pd.Series(unique_ids)
+
+    # Join the numeric IDs against the employee list
+    numeric_ids = pd.to_numeric(unique_ids, errors="coerce")
+    names = numeric_ids.map(pd.Series(employee_list, dtype=object))
+
+    # Unknown IDs keep their raw value as the name
+    names = names.where(names.notna(), unique_ids.astype(str))
+
+    name_codes, categories = pd.factorize(names)
+    return pd.Series(pd.Categorical.from_codes(name_codes[codes], categories=categories), index=ids.index)
+
+def init_worker(employees, schedules, holidays):
+    # Spawned worker processes start with an empty employee list, the default schedule and no holidays
+    global work_schedules
+    employee_list.clear()
+    employee_list.update(employees)
+    work_schedules = schedules
+    holiday_list.update(holidays)
+
+def create_process_pool(max_workers=None):
+    return ProcessPoolExecutor(
+        max_workers=max_workers or os.cpu_count(),
+        initializer=init_worker,
+        initargs=(dict(employee_list), work_schedules, dict(holiday_list))
+    )
+
+def write_dtr_workbook(save_path, df, month, engine=None, source=None):
+    """
+    Builds the summary sheet and the individual DTR sheets of one month and
+    saves them to save_path. Months are independent, so this also runs in
+    worker processes when a file spans several months.
+
+    engine is "openpyxl" (in-memory workbook), "write-only" (streaming) or
+    "xlsxwriter"; it defaults to WORKBOOK_ENGINE. With source (the DAT file
+    name) the month's totals are saved to the monthly_attendance table.
+    """
+    calendar = month_calendar(pd.Period(month, freq="M"))
+
+    # Interpret the punches once for both the summary and the DTR sheets
+    days = sessionize_punches(df, calendar.month)
+
+    # Filter for first time-in and last time-out
+    final_df = filter_in_out_entries(days)
+
+    if final_df.empty:
+        raise ValueError(f"No data available for {calendar.title}. Check the input file.")
+
+    if source is not None:
+        save_monthly_attendance(days, calendar.month, source)
+
+    employees = split_days_by_employee(days)
+    if engine is None:
+        engine = WORKBOOK_ENGINE
+    if engine is None:
+        engine = "write-only" if employees.ngroups >= STREAMING_EMPLOYEE_THRESHOLD else "openpyxl"
+
+    if engine != "openpyxl":
+        return write_layout_workbook(save_path, dtr_sheet_layouts(employees, final_df, calendar), engine)
+
+    with pd.ExcelWriter(save_path, engine="openpyxl") as writer:
+        # Write the attendance sheet with a month-based name
+        write_dtr_summary_sheet(writer, final_df, calendar)
+
+        # Generate individual employee DTR sheets from one Form 48 template
+        template = create_dtr_template_sheet(writer.book, calendar)
+        for name, employee_days in employees:
+            generate_employee_dtr(writer, employee_days, name, template)
+        writer.book.remove(template)
+
+    return save_path
 
-            df.columns = ["Name", "Timestamp"] + [f"Col_{i}" for i in range(2, df.shape[1])]
-            df["Name"] = df["Name"].map(lambda x: employee_list.get(int(float(x)) if isinstance(x, (int, float, str)) and str(x).replace('.', '', 1).isdigit() else x, str(x)))
+def split_days_by_employee(days):
+    """
+    Splits the sessionized days by employee in a single pass, in the order
+    the employees first appear, with the DTR times formatted once for all
+    of them. Iterating the result yields (name, days of the employee).
+    """
+    has_logs = days["Logs"] > 0
+    days = days.assign(
+        ArrivalText=days["Arrival"].dt.strftime("%H:%M").fillna("No In").where(has_logs, ""),
+        DepartureText=days["Departure"].dt.strftime("%H:%M").fillna("No Out").where(has_logs, ""),
+        UndertimeText=format_minutes(days["UndertimeMinutes"])
+    )
+    return days.groupby("Name", observed=True, sort=False)
 
-            df["Timestamp"] = pd.to_datetime(df["Timestamp"], errors="coerce")
-            df = df.dropna(subset=["Timestamp"])  # Remove invalid timestamps
+def dtr_sheet_layouts(employees, final_df, calendar):
+    """
+    Yields (sheet name, layout) for the summary and every employee DTR, one
+    at a time, for the backends that cannot copy a template sheet
+    """
+    yield f"DTR - {calendar.title}", build_summary_layout(final_df, calendar)
+
+    template = build_dtr_template_layout(calendar)
+    template_covered = covered_cells(template["merges"])
+    for name, employee_days in employees:
+        layout = employee_sheet_layout(template, template_covered, employee_days, name)
+        if layout is not None:
+            yield name, layout
+
+def employee_sheet_layout(template, template_covered, employee_days, employee_name):
+    # Complete Form 48 of one employee: the template with their entries on top
+    layout = build_employee_dtr_layout(employee_days, employee_name)
+    if layout is None:
+        return None
+
+    widths = layout_text_widths(layout, template_covered | covered_cells(layout["merges"]))
+    layout = overlay_layout(template, layout)
+
+    # Widen the template's fitted columns where the entries are longer
+    for column, width in widths.items():
+        if width > layout["column_widths"].get(column, 0):
+            layout["column_widths"][column] = width
+    return layout
+
+def write_layout_workbook(save_path, sheet_layouts, engine):
+    # Writes (sheet name, layout) pairs as a workbook with the given engine
+    if engine == "write-only":
+        return write_dtr_workbook_streaming(save_path, sheet_layouts)
+    if engine == "xlsxwriter":
+        return write_dtr_workbook_xlsxwriter(save_path, sheet_layouts)
+    if engine != "openpyxl":
+        raise ValueError(f"Unknown workbook engine: {engine}")
+
+    workbook = openpyxl.Workbook()
+    workbook.remove(workbook.active)
+    register_cell_styles(workbook)
+    for title, layout in sheet_layouts:
+        write_sheet_layout(workbook.create_sheet(title), layout)
+
+    workbook.save(save_path)
+    return save_path
+
+def write_dtr_workbook_streaming(save_path, sheet_layouts):
+    """
+    Writes the DTR workbook through a write-only openpyxl workbook. Each
+    sheet is laid out, streamed to disk and released before the next one.
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    register_cell_styles(workbook)
 
-            if df.empty:
-                messagebox.showerror("Error", "No valid timestamps found in the DAT file.")
-                return
+    for title, layout in sheet_layouts:
+        stream_sheet_layout(workbook.create_sheet(title), layout)
 
-            # Extract the month and year for sheet naming and headers
-            first_date = df["Timestamp"].min()
-            month_year = first_date.strftime("%B %Y")  # Example: "January 2025"
-            sheet_name = f"DTR - {month_year}"
+    workbook.save(save_path)
+    return save_path
 
-            # Filter for first time-in and last time-out
-            final_df = filter_in_out_entries(df)
+def write_dtr_workbook_xlsxwriter(save_path, sheet_layouts):
+    """
+    Writes the DTR workbook with xlsxwriter in constant memory mode, where
+    each row goes to disk as soon as the next one is started
+    """
+    if xlsxwriter is None:
+        raise ValueError("The xlsxwriter engine needs the xlsxwriter package (pip install xlsxwriter).")
+
+    workbook = xlsxwriter.Workbook(save_path, {"constant_memory": True})
+    formats = xlsxwriter_formats(workbook)
+
+    for title, layout in sheet_layouts:
+        # Excel limits sheet names to 31 characters
+        write_xlsxwriter_layout(workbook.add_worksheet(title[:31]), layout, formats)
+
+    workbook.close()
+    return save_path
+
+def load_dat_punches(dat_file, months=None, select=None):
+    """
+    Reads the punches of a DAT file and splits them by the month of their
+    work day. months and select work as in read_dat_file, and only those
+    months are returned. Returns the partitions and the month entries.
+    """
+    selected = [months]
+    def pick(entries):
+        selected[0] = select(entries)
+        return selected[0]
 
-            if final_df.empty:
-                messagebox.showerror("Error", "No data available for conversion. Check the input file.")
-                return
+    df, rows_read, entries = read_dat_file(dat_file, months, None if select is None else pick)
+    months = selected[0]
+
+    if rows_read == 0:
+        raise ValueError(f"The file {dat_file} is empty.")
+    if months is not None and len(months) == 0:
+        return {}, entries
+
+    df["Name"] = resolve_employee_names(df["Name"])
+
+    if df.empty:
+        raise ValueError("No valid timestamps found in the DAT file.")
+
+    df = suppress_duplicate_punches(df)
+
+    # Split the punches by the month of their work day in one pass, so a
+    # night shift's departure on the 1st stays with the previous month
+    partitions = dict(tuple(df.groupby(work_dates(df["Name"], df["Timestamp"]).dt.to_period("M"))))
+    if months is not None:
+        months = {pd.Period(month, freq="M") for month in months}
+        partitions = {month: month_df for month, month_df in partitions.items() if month in months}
+        if not partitions and select is None:
+            raise ValueError(f"The file {dat_file} has no punches in the selected months.")
+    return partitions, entries
+
+def suppress_duplicate_punches(df, window=None):
+    """
+    Drops repeat punches in one sorted pass over every employee: a punch
+    within window minutes (DUPLICATE_PUNCH_WINDOW_MINUTES by default) of the
+    employee's previous punch on the same side of the schedule's in/out
+    split continues a burst. A burst keeps its first punch before the split
+    (the arrival side) and its last punch from the split on (the departure
+    side). The remaining punches keep their order.
+    """
+    if window is None:
+        window = DUPLICATE_PUNCH_WINDOW_MINUTES
+    if window <= 0 or len(df) < 2:
+        return df
+
+    # Side of the split of every punch, in minutes of the work day as in sessionize_punches
+    work_date = work_dates(df["Name"], df["Timestamp"])
+    minute = ((df["Timestamp"] - work_date) // pd.Timedelta(minutes=1)).to_numpy()
+    afternoon = minute >= work_schedules["split"][schedule_codes(df["Name"], work_date.dt.weekday.to_numpy())]
+
+    codes, _ = pd.factorize(df["Name"])
+    stamps = df["Timestamp"].to_numpy()
+    order = np.lexsort((stamps, codes))
+    codes, stamps, afternoon = codes[order], stamps[order], afternoon[order]
+
+    # Same employee and side as the previous punch and not more than window minutes later
+    repeat = np.zeros(len(df) + 1, dtype=bool)
+    repeat[1:-1] = (
+        (codes[1:] == codes[:-1]) & (afternoon[1:] == afternoon[:-1])
+        & (stamps[1:] - stamps[:-1] <= np.timedelta64(window, "m"))
+    )
+
+    # Morning bursts keep the punch no repeat precedes, afternoon ones the punch no repeat follows
+    keep = np.ones(len(df), dtype=bool)
+    keep[order] = np.where(afternoon, ~repeat[1:], ~repeat[:-1])
+    return df[keep].reset_index(drop=True)
+
+def monthly_save_paths(save_path, months):
+    if len(months) == 1:
+        return {months[0]: save_path}
+
+    # One workbook per month, e.g. "attlog - January 2025.xlsx"
+    root_path, ext = os.path.splitext(save_path)
+    return {month: f"{root_path} - {month.strftime('%B %Y')}{ext}" for month in months}
+
+def latest_dat_month(dat_file):
+    # Month of the last punch; terminals append in order, so only the tail is read
+    end = os.path.getsize(dat_file)
+    with open(dat_file, 'rb') as file:
+        file.seek(max(0, end - 64 * 1024))
+        tail = file.read(end - max(0, end - 64 * 1024))
+
+    for line in reversed(tail.splitlines()):
+        fields = line.split(b"\t")
+        if len(fields) > 1:
+            timestamp = pd.to_datetime(fields[1].decode(errors="replace").strip(), errors="coerce")
+            if not pd.isna(timestamp):
+                return timestamp.to_period("M")
+    return None
+
+def parse_month_choice(text):
+    """
+    Reads the months typed in the month prompt: "all" (None), "latest"
+    (LATEST_MONTH) or months such as "2025-01, 2025-02".
+    """
+    text = text.strip().lower()
+    if text == "all":
+        return None
+    if text in ("", LATEST_MONTH):
+        return LATEST_MONTH
+    try:
+        return sorted({pd.Period(month.strip(), freq="M") for month in text.split(",") if month.strip()})
+    except ValueError:
+        raise ValueError(f"Invalid months \"{text}\". Enter months as YYYY-MM, separated by commas, \"latest\" or \"all\".")
+
+def dat_file_months(dat_file, months):
+    # The months to convert of one DAT file, None for all of them
+    if months == LATEST_MONTH:
+        latest = latest_dat_month(dat_file)
+        return None if latest is None else [latest]
+    return months
+
+@lru_cache(maxsize=None)
+def program_version():
+    # Checksum of this program, so an update re-renders the workbooks
+    digest = hashlib.sha256()
+    try:
+        with open(sys.executable if getattr(sys, "frozen", False) else __file__, 'rb') as program:
+            hash_dat_range(program, 0, os.path.getsize(program.name), digest)
+    except OSError:
+        pass
+    return digest.hexdigest()
 
+def render_version(month, entries):
+    """
+    What the workbook of a month is rendered from: the cache entry of its
+    punches (and of the next month's when night shifts reach into it), the
+    employee list, schedules, holidays and the program itself. None when
+    the punches have no entry.
+    """
+    parts = [entries.get(month)]
+    if (work_schedules["cutoff"] > 0).any():
+        parts.append(entries.get(month + 1, ""))
+    if None in parts:
+        return None
+
+    settings = repr((
+        sorted(employee_list.items()), sorted(holiday_list.items()), DUPLICATE_PUNCH_WINDOW_MINUTES,
+        WORKBOOK_ENGINE, STREAMING_EMPLOYEE_THRESHOLD,
+        [(key, np.asarray(value).tolist()) for key, value in sorted(work_schedules.items())]
+    ))
+    return "+".join(parts) + "|" + hashlib.sha256(settings.encode()).hexdigest() + "|" + program_version()
+
+def render_current(save_path, version):
+    # The workbook at save_path exists and was rendered from exactly this version
+    if version is None or not os.path.exists(save_path):
+        return False
+    conn = sqlite3.connect("conversion_history.db")
+    cursor = conn.cursor()
+    cursor.execute("SELECT version FROM dat_renders WHERE output_path = ?", (os.path.abspath(save_path),))
+    row = cursor.fetchone()
+    conn.close()
+    return row is not None and row[0] == version
+
+def record_render(save_path, version):
+    if version is None:
+        return
+    conn = sqlite3.connect("conversion_history.db")
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO dat_renders (output_path, version, rendered_at) VALUES (?, ?, ?)",
+                     (os.path.abspath(save_path), version, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+    conn.close()
+
+def load_stale_months(dat_file, save_path, months=None):
+    """
+    Brings the cached months of a DAT file up to date and loads only those
+    (of months, or of the whole file) whose workbook is missing or was
+    rendered from other punches or settings. Returns their partitions, and
+    the save path and render version of every target month.
+    """
+    save_paths = {}
+    versions = {}
+
+    def stale(entries):
+        targets = sorted(entries) if months is None else sorted({pd.Period(month, freq="M") for month in months} & set(entries))
+        if not targets:
+            raise ValueError(f"The file {dat_file} has no punches in the selected months.")
+        save_paths.update(monthly_save_paths(save_path, targets))
+        versions.update({month: render_version(month, entries) for month in targets})
+        return [month for month in targets if not render_current(save_paths[month], versions[month])]
+
+    partitions, _ = load_dat_punches(dat_file, months, stale)
+    return partitions, save_paths, versions
+
+def convert_dat_file(dat_file, save_path, months=None):
+    """
+    Converts one DAT file (only months, see dat_file_months) without any
+    dialogs and returns the workbooks written; months whose workbook is up
+    to date are not rendered again. Runs inside a worker process in the
+    parallel batch mode.
+    """
+    partitions, save_paths, versions = load_stale_months(dat_file, save_path, dat_file_months(dat_file, months))
+    source = os.path.basename(dat_file)
+
+    written = []
+    for month, month_df in partitions.items():
+        written.append(write_dtr_workbook(save_paths[month], month_df, month, source=source))
+        record_render(save_paths[month], versions[month])
+    return written
+
+def unique_name(name, used_names):
+    # Numbers names already taken as "name (2)", "name (3)", ... (case-insensitive)
+    base_name, copy = name, 2
+    while name.lower() in used_names:
+        name = f"{base_name} ({copy})"
+        copy += 1
+    used_names.add(name.lower())
+    return name
+
+def write_employee_workbooks(output_dir, df, month, zip_path=None, engine=None, max_workers=None, source=None):
+    """
+    Writes the DTR of every employee of one month as a workbook of its own
+    in output_dir, rendered in a process pool. With zip_path the workbooks
+    are bundled into that zip instead. Returns the files written. source
+    works as in write_dtr_workbook.
+    """
+    month = pd.Period(month, freq="M")
+    days = sessionize_punches(df, month)
+    if days.empty:
+        raise ValueError(f"No data available for {month.strftime('%B %Y')}. Check the input file.")
+
+    if source is not None:
+        save_monthly_attendance(days, month, source)
+
+    calendar = month_calendar(month)
+    # Small single-sheet files save fastest with xlsxwriter, streaming does not pay off
+    engine = engine or WORKBOOK_ENGINE or ("xlsxwriter" if xlsxwriter is not None else "openpyxl")
+
+    if zip_path is None:
+        os.makedirs(output_dir, exist_ok=True)
+        return render_employee_workbooks(output_dir, days, calendar, engine, max_workers)
+
+    # xlsx files are compressed already, so they are only stored in the zip
+    with tempfile.TemporaryDirectory() as work_dir:
+        paths = render_employee_workbooks(work_dir, days, calendar, engine, max_workers)
+        with zipfile.ZipFile(zip_path, "w") as bundle:
+            for path in paths:
+                bundle.write(path, os.path.basename(path))
+    return [zip_path]
+
+def render_employee_workbooks(output_dir, days, calendar, engine, max_workers=None):
+    # One file per employee, named after them without the characters Windows rejects
+    tasks = []
+    used_names = set()
+    for name, employee_days in split_days_by_employee(days):
+        file_name = unique_name(re.sub(r'[\\/:*?"<>|]', "_", str(name)).strip(), used_names)
+        tasks.append((os.path.join(output_dir, f"{file_name}.xlsx"), name, employee_days))
+
+    # A few chunks per worker keep the pool busy without pickling every file separately
+    max_workers = min(len(tasks), max_workers or os.cpu_count())
+    chunk_size = -(-len(tasks) // (max_workers * 4))
+    chunks = [tasks[i:i + chunk_size] for i in range(0, len(tasks), chunk_size)]
+
+    paths = []
+    with create_process_pool(max_workers) as pool:
+        for written in pool.map(write_employee_workbook_chunk, chunks,
+                                [calendar] * len(chunks), [engine] * len(chunks)):
+            paths.extend(written)
+    return paths
+
+def write_employee_workbook_chunk(tasks, calendar, engine):
+    # Runs in a worker process, the template is laid out once per chunk
+    template = build_dtr_template_layout(calendar)
+    template_covered = covered_cells(template["merges"])
+
+    paths = []
+    for save_path, name, employee_days in tasks:
+        layout = employee_sheet_layout(template, template_covered, employee_days, name)
+        if layout is not None:
+            paths.append(write_layout_workbook(save_path, [(name, layout)], engine))
+    return paths
+
+def convert_batch_parallel(files, output_dir, max_workers=None, months=None):
+    """
+    Converts independent DAT files in a process pool sized to the machine.
+    Every workbook written is recorded in the conversion history, and the
+    result of each file is returned as (dat_file, save_paths, error).
+    """
+    # Branch offices often export files with the same name
+    save_paths = {}
+    used_names = set()
+    for dat_file in files:
+        name = unique_name(os.path.basename(dat_file).replace(".dat", ""), used_names)
+        save_paths[dat_file] = os.path.join(output_dir, f"{name}.xlsx")
+
+    results = []
+    with create_process_pool(min(len(files), max_workers or os.cpu_count())) as pool:
+        futures = {pool.submit(convert_dat_file, dat_file, save_paths[dat_file], months): dat_file for dat_file in files}
+        for future in as_completed(futures):
+            dat_file = futures[future]
+            try:
+                written = future.result()
+            except Exception as e:
+                results.append((dat_file, [], str(e)))
+                continue
+
+            for path in written:
+                save_to_database(os.path.basename(dat_file), path)
+            results.append((dat_file, written, None))
+
+    return results
+
+def convert_batch_to_excel_parallel(files, months=None):
+    output_dir = filedialog.askdirectory(title="Select Folder for Converted Excel Files")
+    if not output_dir:
+        return
+
+    try:
+        results = convert_batch_parallel(files, output_dir, months=months)
+    except Exception as e:
+        messagebox.showerror("Error", f"Failed to convert files: {str(e)}")
+        return
+
+    failed = [(dat_file, error) for dat_file, _, error in results if error]
+    report = f"{len(results) - len(failed)} of {len(results)} files converted successfully."
+    if failed:
+        report += "\n\nFailed:\n" + "\n".join(f"{os.path.basename(dat_file)}: {error}" for dat_file, error in failed)
+        messagebox.showwarning("Conversion Complete", report)
+    else:
+        messagebox.showinfo("Conversion Complete", report)
+
+def convert_per_employee(files, months=None):
+    output_dir = filedialog.askdirectory(title="Select Folder for the Employee DTR Files")
+    if not output_dir:
+        return
+
+    bundle = messagebox.askyesno("Employee DTR Files", "Bundle each month's employee files into a single zip?")
+
+    written = 0
+    for dat_file in files:
+        try:
+            partitions, _ = load_dat_punches(dat_file, dat_file_months(dat_file, months))
+            base_name = os.path.basename(dat_file).replace(".dat", "")
+
+            # One folder (or zip) per DAT file and month, e.g. "attlog - January 2025"
+            for month, month_df in partitions.items():
+                target = os.path.join(output_dir, f"{base_name} - {month.strftime('%B %Y')}")
+                if bundle:
+                    written += len(write_employee_workbooks(target, month_df, month, zip_path=target + ".zip",
+                                                            source=os.path.basename(dat_file)))
+                    save_to_database(os.path.basename(dat_file), target + ".zip")
+                else:
+                    written += len(write_employee_workbooks(target, month_df, month, source=os.path.basename(dat_file)))
+                    save_to_database(os.path.basename(dat_file), target)
+
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to convert {os.path.basename(dat_file)}: {str(e)}")
+            return
+
+    kind = "zip files" if bundle else "employee DTR files"
+    messagebox.showinfo("Conversion Complete", f"{written} {kind} written to {output_dir}.")
+
+def export_payroll(files, months=None):
+    for dat_file in files:
+        csv_path = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV Files", "*.csv")],
+            initialfile=os.path.basename(dat_file).replace(".dat", " - payroll.csv"),
+            title="Save Payroll Export"
+        )
+        if not csv_path:
+            continue
+
+        try:
+            csv_path, npz_path = write_payroll_export(dat_file, csv_path, months)
+            save_to_database(os.path.basename(dat_file), csv_path)
+            messagebox.showinfo("Export Complete", f"Payroll data saved to:\n{csv_path}\n{npz_path}")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to export payroll data: {str(e)}")
+
+def convert_batch_to_excel(files, months=None):
+    for dat_file in files:
+        try:
             # Get save path from user
             save_path = filedialog.asksaveasfilename(
                 defaultextension=".xlsx",
@@ -485,25 +1540,40 @@ def convert_batch_to_excel(files):
             )
 
             if save_path:
-                with pd.ExcelWriter(save_path, engine="openpyxl") as writer:
-                    # Write the attendance sheet with a month-based name
-                    final_df.to_excel(writer, sheet_name=sheet_name, index=False, startrow=2)
-                    
-                    # Format the summary sheet to match the desired layout
-                    format_dtr_summary_sheet(writer, final_df, month_year)
-
-                    # Generate individual employee DTR sheets
-                    for name in df["Name"].unique():
-                        generate_employee_dtr(writer, df, name)
-
-                # Auto-adjust column widths
-                auto_adjust_column_widths(save_path)
-                
-                save_to_database(os.path.basename(dat_file), save_path)
-
-                open_file = messagebox.askyesno("Conversion Complete", "File converted successfully!\nDo you want to open it now?")
+                # Only the months whose workbook is missing or out of date are rendered
+                try:
+                    partitions, month_paths, versions = load_stale_months(dat_file, save_path, dat_file_months(dat_file, months))
+                except ValueError as e:
+                    messagebox.showerror("Error", str(e))
+                    return
+
+                if len(partitions) <= 1:
+                    save_paths = [write_dtr_workbook(month_paths[month], month_df, month, source=os.path.basename(dat_file))
+                                  for month, month_df in partitions.items()]
+                else:
+                    with create_process_pool(min(len(partitions), os.cpu_count())) as pool:
+                        futures = [
+                            pool.submit(write_dtr_workbook, month_paths[month], month_df, month,
+                                        source=os.path.basename(dat_file))
+                            for month, month_df in partitions.items()
+                        ]
+                        save_paths = [future.result() for future in futures]
+
+                for month in partitions:
+                    record_render(month_paths[month], versions[month])
+                for path in save_paths:
+                    save_to_database(os.path.basename(dat_file), path)
+
+                if not save_paths:
+                    open_file = messagebox.askyesno("Conversion Complete", "The Excel files are already up to date.\nDo you want to open them now?")
+                    save_paths = list(month_paths.values())
+                elif len(save_paths) == 1:
+                    open_file = messagebox.askyesno("Conversion Complete", "File converted successfully!\nDo you want to open it now?")
+                else:
+                    open_file = messagebox.askyesno("Conversion Complete", f"{len(save_paths)} monthly files converted successfully!\nDo you want to open them now?")
                 if open_file:
-                    subprocess.run(["start", "", save_path], shell=True)
+                    for path in save_paths:
+                        subprocess.run(["start", "", path], shell=True)
 
         except Exception as e:
             messagebox.showerror("Error", f"Failed to convert file: {str(e)}")
@@ -548,732 +1618,444 @@ def load_employee_list():
     employee_list = {emp_id: name for emp_id, name in rows}
     conn.close()
 
-def generate_employee_dtr(writer, df, employee_name):
-    # Filter data for specific employee
-    employee_df = df[df["Name"] == employee_name].copy()
-    if employee_df.empty:
+def new_sheet_layout():
+    # Cells, merged ranges and dimensions of a sheet, rendered by either workbook backend
+    return {
+        "cells": {},          # (row, column) -> (value, style name)
+        "merges": [],         # Ranges such as "A1:E1"
+        "row_heights": {},
+        "column_widths": {},
+        "freeze_panes": None
+    }
+
+def put_cell(layout, row, column, value=None, style=None):
+    layout["cells"][(row, column)] = (value, style)
+
+def merge_layout_cells(layout, first_row, first_column, last_row, last_column):
+    layout["merges"].append(f"{get_column_letter(first_column)}{first_row}:{get_column_letter(last_column)}{last_row}")
+
+def put_merged_row(layout, row, first_column, last_column, value, style=None):
+    # Value in the first cell of a range merged across one row
+    merge_layout_cells(layout, row, first_column, row, last_column)
+    put_cell(layout, row, first_column, value, style)
+
+def write_sheet_layout(worksheet, layout):
+    """
+    Renders a sheet layout into a regular (in-memory) openpyxl worksheet
+    """
+    # The layout styles the covered cells itself, so the ranges are only
+    # registered; merge_cells would re-derive their borders, which is slow
+    for cell_range in layout["merges"]:
+        worksheet.merged_cells.add(cell_range)
+
+    for (row, column), (value, style) in layout["cells"].items():
+        cell = worksheet.cell(row=row, column=column)
+        if value is not None:
+            cell.value = value
+        if style:
+            cell.style = style
+
+    for row, height in layout["row_heights"].items():
+        worksheet.row_dimensions[row].height = height
+    for column, width in layout["column_widths"].items():
+        worksheet.column_dimensions[column].width = width
+    if layout["freeze_panes"]:
+        worksheet.freeze_panes = layout["freeze_panes"]
+
+def stream_sheet_layout(worksheet, layout):
+    """
+    Renders a sheet layout into a write-only worksheet row by row and closes
+    it, so the rows are flushed to disk instead of staying in memory
+    """
+    # A write-only sheet needs its columns and panes before the first row
+    for column, width in layout["column_widths"].items():
+        worksheet.column_dimensions[column].width = width
+    if layout["freeze_panes"]:
+        worksheet.freeze_panes = layout["freeze_panes"]
+    for cell_range in layout["merges"]:
+        worksheet.merged_cells.add(cell_range)
+
+    rows = {}
+    for (row, column), (value, style) in layout["cells"].items():
+        rows.setdefault(row, {})[column] = (value, style)
+
+    for row in range(1, max(rows, default=0) + 1):
+        if row in layout["row_heights"]:
+            worksheet.row_dimensions[row].height = layout["row_heights"][row]
+
+        cells = rows.get(row, {})
+        values = [None] * max(cells, default=0)
+        for column, (value, style) in cells.items():
+            cell = WriteOnlyCell(worksheet, value)
+            if style:
+                cell.style = style
+            values[column - 1] = cell
+        worksheet.append(values)
+
+    worksheet.close()
+
+def text_width(value):
+    # Auto-fit width of a value: its length plus padding, whole floats show as integers
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return len(str(value)) + 2
+
+def xlsxwriter_formats(workbook):
+    """
+    Builds an xlsxwriter format for every shared cell style from the same
+    CELL_STYLES specs the openpyxl named styles are made of
+    """
+    # Unstyled cells
+    formats = {None: workbook.add_format()}
+
+    for name, style in CELL_STYLES.items():
+        properties = {}
+
+        font = style.get("font")
+        if font is not None:
+            properties["bold"] = bool(font.b)
+            if font.u == 'single':
+                properties["underline"] = 1
+            if font.name:
+                properties["font_name"] = font.name
+            if font.sz:
+                properties["font_size"] = font.sz
+
+        alignment = style.get("alignment")
+        if alignment is not None:
+            if alignment.horizontal:
+                properties["align"] = alignment.horizontal
+            if alignment.vertical:
+                properties["valign"] = "vcenter" if alignment.vertical == "center" else alignment.vertical
+
+        if style.get("border") is not None:
+            properties["border"] = 1  # Thin on all sides
+
+        fill = style.get("fill")
+        if fill is not None:
+            properties["pattern"] = 1
+            properties["bg_color"] = "#" + fill.fgColor.rgb[-6:]
+
+        formats[name] = workbook.add_format(properties)
+
+    return formats
+
+def write_xlsxwriter_layout(worksheet, layout, formats):
+    """
+    Renders a sheet layout into an xlsxwriter worksheet. In constant memory
+    mode a row is flushed once a later row is written, so the cells are
+    written strictly in row order.
+    """
+    for column, width in layout["column_widths"].items():
+        index = column_index_from_string(column) - 1
+        # openpyxl stores widths as given while xlsxwriter adds Excel's cell
+        # padding; sizing in pixels (7 per character in Calibri 11) matches
+        worksheet.set_column_pixels(index, index, round(width * 7))
+    if layout["freeze_panes"]:
+        worksheet.freeze_panes(layout["freeze_panes"])
+
+    rows = {}
+    for (row, column), (value, style) in layout["cells"].items():
+        rows.setdefault(row, []).append((column, value, style))
+
+    # Merged ranges by their first row, each is merged when that row comes up
+    merges = {}
+    for cell_range in layout["merges"]:
+        min_col, min_row, max_col, max_row = CellRange(cell_range).bounds
+        merges.setdefault(min_row, []).append((min_col, max_col, max_row))
+
+    for row in sorted(set(rows) | set(merges) | set(layout["row_heights"])):
+        if row in layout["row_heights"]:
+            worksheet.set_row(row - 1, layout["row_heights"][row])
+            if row not in rows:
+                # A row without cells is never flushed and would lose its height
+                worksheet.write_blank(row - 1, 0, None, formats[None])
+
+        # Without a format merge_range writes no blanks past the first cell, so
+        # a range spanning several rows doesn't flush this one. The layout
+        # writes every cell of the range itself, in its row, with its own style.
+        for min_col, max_col, max_row in merges.get(row, []):
+            worksheet.merge_range(row - 1, min_col - 1, max_row - 1, max_col - 1, None)
+
+        for column, value, style in sorted(rows.get(row, []), key=lambda cell: cell[0]):
+            worksheet.write(row - 1, column - 1, value, formats[style])
+
+
+def fit_width(widths, column, value):
+    # Columns are as wide as their longest non-empty value
+    if value:
+        widths[column] = max(widths.get(column, 0), text_width(value))
+
+def covered_cells(merges):
+    covered = set()
+    for cell_range in merges:
+        covered.update(CellRange(str(cell_range)).cells)
+    return covered
+
+def layout_text_widths(layout, covered):
+    """
+    Auto-fit widths of the columns of a layout by column letter. Values in
+    merged ranges (the covered cells) span several columns and are left out.
+    """
+    widths = {}
+    for (row, column), (value, style) in layout["cells"].items():
+        if (row, column) not in covered:
+            fit_width(widths, get_column_letter(column), value)
+    return widths
+
+def build_summary_layout(df, calendar):
+    """
+    Lays out the DTR summary sheet from the table of filter_in_out_entries:
+    the month title, the ID/NAME and date/day/AM-PM headers, and one row of
+    Time In/Time Out values per employee
+    """
+    time_columns = summary_time_columns(df)
+    unique_dates = [date_str for date_str, _, _ in time_columns]
+
+    layout = new_sheet_layout()
+    header_row = 3
+    start_col = 3  # Column C (after ID and Name)
+    total_columns = 2 + (len(unique_dates) * 2)
+
+    # Title merged across all columns
+    put_merged_row(layout, 1, 1, total_columns, calendar.title.upper(), "DTR Title")
+    layout["row_heights"].update({1: 30, 2: 15, header_row: 25, header_row + 1: 25, header_row + 2: 25})
+
+    # ID and NAME headers merged down the three header rows
+    for column, label in [(1, "ID"), (2, "NAME")]:
+        merge_layout_cells(layout, header_row, column, header_row + 2, column)
+        put_cell(layout, header_row, column, label, "DTR Header")
+        put_cell(layout, header_row + 1, column, None, "DTR Header")
+        put_cell(layout, header_row + 2, column, None, "DTR Header")
+    layout["column_widths"].update({'A': 15, 'B': 30})
+
+    for i, date_str in enumerate(unique_dates):
+        position = calendar.positions[date_str]
+        date_col = start_col + i*2
+        day_name = calendar.day_names[position]
+        day_style = calendar.day_styles[position]
+
+        layout["column_widths"][get_column_letter(date_col)] = 12.00
+        layout["column_widths"][get_column_letter(date_col + 1)] = 12.00
+
+        # Date and day name merged over the AM/PM pair
+        put_merged_row(layout, header_row, date_col, date_col + 1, calendar.header_texts[position], "DTR Bold Box")
+        put_cell(layout, header_row, date_col + 1, None, "DTR Border")
+        put_merged_row(layout, header_row + 1, date_col, date_col + 1, day_name, day_style)
+        put_cell(layout, header_row + 1, date_col + 1, None, day_style)
+        put_cell(layout, header_row + 2, date_col, "AM", day_style)
+        put_cell(layout, header_row + 2, date_col + 1, "PM", day_style)
+
+    # Employee rows from row 6
+    employee_start_row = header_row + 3
+    for i, (employee_id, name, values) in enumerate(summary_rows(df)):
+        row_number = employee_start_row + i
+        layout["row_heights"][row_number] = 45
+        put_cell(layout, row_number, 1, employee_id, "DTR Box")
+        put_cell(layout, row_number, 2, name, "DTR Name Box")
+
+        for date_idx, (date_str, in_position, out_position) in enumerate(time_columns):
+            if in_position is not None and out_position is not None:
+                put_cell(layout, row_number, start_col + date_idx*2, values[in_position], "DTR Time Box")
+                put_cell(layout, row_number, start_col + date_idx*2 + 1, values[out_position], "DTR Time Box")
+
+    # Freeze the headers and the ID/Name columns
+    layout["freeze_panes"] = 'C6'
+
+    # Columns holding values are fitted to them
+    layout["column_widths"].update(layout_text_widths(layout, covered_cells(layout["merges"])))
+    return layout
+
+def generate_employee_dtr(writer, employee_days, employee_name, template):
+    layout = build_employee_dtr_layout(employee_days, employee_name)
+    if layout is None:
         return
+
+    # Clone the month's Form 48 and fill in the employee
+    worksheet = writer.book.copy_worksheet(template)
+    worksheet.title = employee_name
+    write_sheet_layout(worksheet, layout)
+
+    # Widen the template's fitted columns where the entries are longer
+    covered = covered_cells(worksheet.merged_cells.ranges)
+    for column, width in layout_text_widths(layout, covered).items():
+        if width > worksheet.column_dimensions[column].width:
+            worksheet.column_dimensions[column].width = width
+
+def create_dtr_template_sheet(workbook, calendar):
+    # Hidden working copy of the month's Form 48, removed before saving
+    register_cell_styles(workbook)
+    template = workbook.create_sheet("Form 48 Template")
+    write_sheet_layout(template, build_dtr_template_layout(calendar))
+    return template
+
+def overlay_layout(template, layout):
+    # Template with the employee cells on top, unstyled cells keep the template style
+    cells = dict(template["cells"])
+    for key, (value, style) in layout["cells"].items():
+        cells[key] = (value, style or cells.get(key, (None, None))[1])
+
+    return {
+        "cells": cells,
+        "merges": template["merges"] + layout["merges"],
+        "row_heights": {**template["row_heights"], **layout["row_heights"]},
+        "column_widths": {**template["column_widths"], **layout["column_widths"]},
+        "freeze_panes": layout["freeze_panes"] or template["freeze_panes"]
+    }
+
+def build_dtr_template_layout(calendar):
+    """
+    Lays out the static part of the Civil Service Form No. 48 for a month,
+    two identical copies side by side (A-F and I-N). It is built once per
+    workbook and every employee sheet is cloned from it, leaving only the
+    name, the Saturday count, the day entries and the total to fill in.
+    """
+    certification = [
+        "I certify on my honor that the above is a true and",
+        "correct report of the hours of work performed, record",
+        "of which was made daily at the time of arrival and",
+        "departure from office."
+    ]
     
-    # Generate date range for the month
-    first_date = employee_df["Timestamp"].min().date()
-    year, month = first_date.year, first_date.month
-    month_name = first_date.strftime('%B')
-    first_day = datetime(year, month, 1)
-    last_day = (first_day.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
-    all_dates = pd.date_range(first_day, last_day).date
-    
-    # Create the workbook
-    worksheet = writer.book.create_sheet(employee_name)
-    
-    # --- Header Section ---
-    # Create Civil Service form header
-    worksheet.merge_cells('A1:E1')
-    worksheet.merge_cells('I1:M1')
-    cell = worksheet['A1']
-    cell.value = "Civil Service Form No. 48"
-    cell.alignment = Alignment(horizontal='center')
-    
-    cell = worksheet['I1']
-    cell.value = "Civil Service Form No. 48"
-    cell.alignment = Alignment(horizontal='center')
-    
-    # Create DAILY TIME RECORD header
-    worksheet.merge_cells('A2:E2')
-    worksheet.merge_cells('I2:M2')
-    cell = worksheet['A2']
-    cell.value = "DAILY TIME RECORD"
-    cell.alignment = Alignment(horizontal='center')
-    cell.font = Font(bold=True)
-    
-    cell = worksheet['I2']
-    cell.value = "DAILY TIME RECORD"
-    cell.alignment = Alignment(horizontal='center')
-    cell.font = Font(bold=True)
-    
-    # Add Employee Name (bold, centered, and underlined) above "NAME"
-    worksheet.merge_cells('A3:E3')
-    worksheet.merge_cells('I3:M3')
-    cell = worksheet['A3']
-    cell.value = employee_name.upper()
-    cell.alignment = Alignment(horizontal='center')
-    cell.font = Font(bold=True, underline='single')  # Add underline
-    
-    cell = worksheet['I3']
-    cell.value = employee_name.upper()
-    cell.alignment = Alignment(horizontal='center')
-    cell.font = Font(bold=True, underline='single')  # Add underline
-    
-    # Add NAME label
-    worksheet.merge_cells('A4:E4')
-    worksheet.merge_cells('I4:M4')
-    cell = worksheet['A4']
-    cell.value = "NAME"
-    cell.alignment = Alignment(horizontal='center')
-    
-    cell = worksheet['I4']
-    cell.value = "NAME"
-    cell.alignment = Alignment(horizontal='center')
-    
-    # Add spacing row between NAME and "For the month of"
-    worksheet.row_dimensions[5].height = 15  # Add space between NAME and month info
-    
-    # --- Month and Hours Section ---
-    # Add month info (moved to row 6 instead of 5)
-    month_range = f"{month_name} 1-{last_day.day}, {year}"
-    
-    worksheet.merge_cells('A6:E6')  # Changed from A5:E5 to A6:E6
-    cell = worksheet['A6']  # Changed from A5 to A6
-    cell.value = f"For the month of      {month_range}"
-    
-    worksheet.merge_cells('I6:M6')  # Changed from I5:M5 to I6:M6
-    cell = worksheet['I6']  # Changed from I5 to I6
-    cell.value = f"For the month of      {month_range}"
-    
-    # Add official hours info (adjust row numbers)
-    worksheet.merge_cells('A7:E7')  # Changed from A6:E6 to A7:E7
-    cell = worksheet['A7']  # Changed from A6 to A7
-    cell.value = "Official hours for arrival and departure:"
-    
-    worksheet.merge_cells('I7:M7')  # Changed from I6:M6 to I7:M7
-    cell = worksheet['I7']  # Changed from I6 to I7
-    cell.value = "Official hours for arrival and departure:"
-    
-    # Extract and process time logs
-    employee_df["Date"] = employee_df["Timestamp"].dt.date
-    employee_df["Hour"] = employee_df["Timestamp"].dt.hour
-    employee_df["Time"] = employee_df["Timestamp"].dt.strftime("%H:%M")
-    
-    # Create a calendar dictionary with default values
-    calendar_data = {}
+    layout = new_sheet_layout()
     
-    # Fill in logs with default values
-    for i, date in enumerate(all_dates, 1):
-        date_str = date.strftime('%Y-%m-%d')
-        weekday = date.weekday()
+    for col in (1, 9):
+        # --- Header Section ---
+        put_merged_row(layout, 1, col, col + 4, "Civil Service Form No. 48", "DTR Center")
+        put_merged_row(layout, 2, col, col + 4, "DAILY TIME RECORD", "DTR Bold")
         
-        # Default values
-        if weekday == 5:  # Saturday
-            calendar_data[i] = {
-                'date': date,
-                'arrival': '',
-                'departure': '',
-                'lunch_out': '',
-                'lunch_in': '',
-                'special': 'SATURDAY',
-                'undertime': ''  # Add undertime field
-            }
-        elif weekday == 6:  # Sunday
-            calendar_data[i] = {
-                'date': date,
-                'arrival': '',
-                'departure': '',
-                'lunch_out': '',
-                'lunch_in': '',
-                'special': 'SUNDAY',
-                'undertime': ''  # Add undertime field
-            }
-        else:
-            calendar_data[i] = {
-                'date': date,
-                'arrival': '',
-                'departure': '',
-                'lunch_out': '',
-                'lunch_in': '',
-                'special': 'ABSENT',  # Default to ABSENT for weekdays with no logs
-                'undertime': ''  # Add undertime field
-            }
-    
-    # Override with actual logs
-    # Group logs by date
-    logs_by_date = {}
-    for _, row in employee_df.iterrows():
-        date = row["Date"]
-        day = date.day
-        time = row["Time"]
-        hour = row["Hour"]
+        # Employee Name (bold, centered, and underlined) above "NAME"
+        put_merged_row(layout, 3, col, col + 4, None, "DTR Name")
+        put_merged_row(layout, 4, col, col + 4, "NAME", "DTR Center")
         
-        if day not in logs_by_date:
-            logs_by_date[day] = []
+        # --- Month and Hours Section --- (row 5 is a spacer)
+        put_merged_row(layout, 6, col, col + 4, f"For the month of      {calendar.range_text}")
+        put_merged_row(layout, 7, col, col + 4, "Official hours for arrival and departure:")
+        put_merged_row(layout, 8, col, col + 4, f"Regular days: {work_schedules['hours_text'][work_schedules['default']]}")
+        put_merged_row(layout, 9, col, col + 4, None)  # Saturday count
         
-        logs_by_date[day].append((time, hour))
-    
-    # Function to calculate undertime
-    def calculate_undertime(arrival, departure, lunch_out, lunch_in):
-        # Skip calculation if any time is missing
-        if not arrival or not departure or not lunch_out or not lunch_in:
-            return ""
+        # --- Table Headers ---
+        for offset, header in enumerate(["Day", "Arrival", "Departure", "Arrival", "Departure", "Undertime"]):
+            put_cell(layout, 10, col + offset, header, "DTR Box")
         
-        # If "No In" or "No Out" appears, return empty string
-        if arrival == "No In" or departure == "No Out":
-            return ""
+        # Bordered day rows, numbered from 1
+        row_start = 11
+        for date in calendar.dates:
+            put_cell(layout, row_start, col, date.day, "DTR Box")
+            for offset in range(1, 6):
+                put_cell(layout, row_start, col + offset, None, "DTR Box")
+            row_start += 1
         
-        try:
-            # Parse time strings to datetime objects
-            arrival_time = datetime.strptime(arrival, "%H:%M")
-            departure_time = datetime.strptime(departure, "%H:%M")
-            lunch_out_time = datetime.strptime(lunch_out, "%H:%M")
-            lunch_in_time = datetime.strptime(lunch_in, "%H:%M")
-            
-            # Standard work hours (9 hours including 1 hour lunch)
-            std_arrival = datetime.strptime("08:00", "%H:%M")
-            std_departure = datetime.strptime("17:00", "%H:%M")
-            
-            # Calculate actual work hours (excluding lunch)
-            lunch_duration = (lunch_in_time - lunch_out_time).total_seconds() / 3600
-            actual_work_hours = ((departure_time - arrival_time).total_seconds() / 3600) - lunch_duration
-            
-            # Standard work hours (excluding 1 hour lunch)
-            standard_work_hours = 8
-            
-            # Calculate undertime in hours
-            undertime_hours = max(0, standard_work_hours - actual_work_hours)
-            
-            # If late arrival or early departure
-            if arrival_time > std_arrival:
-                late_mins = (arrival_time - std_arrival).total_seconds() / 60
-                undertime_hours += late_mins / 60
-                
-            if departure_time < std_departure:
-                early_mins = (std_departure - departure_time).total_seconds() / 60
-                undertime_hours += early_mins / 60
-            
-            # Format as HH:MM
-            hours = int(undertime_hours)
-            minutes = int((undertime_hours - hours) * 60)
-            
-            if hours > 0 or minutes > 0:
-                return f"{hours:02}:{minutes:02}"
-            else:
-                return ""
-        except:
-            return ""
-    
-    # Process logs for each day
-    for day, logs in logs_by_date.items():
-        if day in calendar_data:
-            # Clear the ABSENT special status if logs exist
-            if calendar_data[day]['special'] == 'ABSENT':
-                calendar_data[day]['special'] = ''
-            
-            # First, filter out duplicate logs in the same hour
-            # For duplicates in the same hour, keep only the latest one
-            filtered_logs = []
-            seen_hours = set()
-            
-            # Sort by timestamp (ascending) to ensure we keep the latest one when filtering
-            logs.sort(key=lambda x: x[1])
-            
-            for time, hour in logs:
-                if hour not in seen_hours:
-                    seen_hours.add(hour)
-                    filtered_logs.append((time, hour))
-            
-            # Now use the filtered logs
-            if len(filtered_logs) == 1:
-                # Single log - determine if it's arrival or departure based on time
-                time, hour = filtered_logs[0]
-                if hour < 12:  # Morning log
-                    calendar_data[day]['arrival'] = time
-                    calendar_data[day]['departure'] = "No Out"
-                    # Set default lunch break for days with logs
-                    calendar_data[day]['lunch_out'] = "12:01"
-                    calendar_data[day]['lunch_in'] = "12:55"
-                else:  # Afternoon log
-                    calendar_data[day]['arrival'] = "No In"
-                    calendar_data[day]['departure'] = time
-                    # Set default lunch break for days with logs
-                    calendar_data[day]['lunch_out'] = "12:01"
-                    calendar_data[day]['lunch_in'] = "12:55"
-            elif len(filtered_logs) >= 2:
-                # Check if logs are all in the morning or all in the afternoon
-                morning_logs = [log for log in filtered_logs if log[1] < 12]
-                afternoon_logs = [log for log in filtered_logs if log[1] >= 12]
-                
-                if morning_logs and not afternoon_logs:
-                    # All logs are in the morning
-                    calendar_data[day]['arrival'] = morning_logs[0][0]  # First morning log
-                    calendar_data[day]['departure'] = "No Out"
-                    # Set default lunch break
-                    calendar_data[day]['lunch_out'] = "12:01"
-                    calendar_data[day]['lunch_in'] = "12:55"
-                elif afternoon_logs and not morning_logs:
-                    # All logs are in the afternoon
-                    calendar_data[day]['arrival'] = "No In"
-                    calendar_data[day]['departure'] = afternoon_logs[-1][0]  # Last afternoon log
-                    # Set default lunch break
-                    calendar_data[day]['lunch_out'] = "12:01"
-                    calendar_data[day]['lunch_in'] = "12:55"
-                else:
-                    # Logs in both morning and afternoon
-                    calendar_data[day]['arrival'] = morning_logs[0][0] if morning_logs else afternoon_logs[0][0]
-                    calendar_data[day]['departure'] = afternoon_logs[-1][0] if afternoon_logs else morning_logs[-1][0]
-                    # Set default lunch break
-                    calendar_data[day]['lunch_out'] = "12:01"
-                    calendar_data[day]['lunch_in'] = "12:55"
-            
-            # Calculate undertime (only for regular weekdays)
-            if calendar_data[day]['special'] == '':
-                calendar_data[day]['undertime'] = calculate_undertime(
-                    calendar_data[day]['arrival'],
-                    calendar_data[day]['departure'],
-                    calendar_data[day]['lunch_out'],
-                    calendar_data[day]['lunch_in']
-                )
-
+        # Total row
+        put_cell(layout, row_start, col, "Total", "DTR Total")
+        for offset in range(1, 5):
+            put_cell(layout, row_start, col + offset, None, "DTR Border")
+        put_cell(layout, row_start, col + 5, None, "DTR Total")
+        
+        # Certification text
+        certification_row = row_start + 2
+        for offset, line in enumerate(certification):
+            put_merged_row(layout, certification_row + offset, col, col + 5, line, "DTR Center")
+        
+        # Signature lines
+        sig_row = certification_row + len(certification) + 2
+        put_merged_row(layout, sig_row, col, col + 5, "_" * 40, "DTR Center")
+        put_merged_row(layout, sig_row + 1, col, col + 5, "Signature of Employee", "DTR Center")
+        
+        # Verification text
+        verify_row = sig_row + 3
+        put_merged_row(layout, verify_row, col, col + 5, "Verified as to the prescribed office hours.", "DTR Center")
+        
+        # Supervisor signature, name and position
+        super_sig_row = verify_row + 3
+        put_merged_row(layout, super_sig_row, col, col + 5, "_" * 40, "DTR Center")
+        put_merged_row(layout, super_sig_row + 1, col, col + 5, "FORTUNATO L. PALILEO", "DTR Bold")
+        put_merged_row(layout, super_sig_row + 2, col, col + 5, "CHIEF, EDP SERVICES", "DTR Center")
     
-    # Count Saturdays with logs
-    saturday_count = sum(1 for i, data in calendar_data.items() 
-                         if data['date'].weekday() == 5 and 
-                         (data['arrival'] or data['departure']))
+    # Add space between NAME and month info
+    layout["row_heights"][5] = 15
     
-    # Add regular days hours (adjust row numbers)
-    worksheet.merge_cells('A8:E8')  # Changed from A7:E7 to A8:E8
-    cell = worksheet['A8']  # Changed from A7 to A8
-    cell.value = "Regular days: 8:00 AM - 5:00 PM"
+    # Column widths of both copies with the gap columns (G, H) between them
+    layout["column_widths"].update({
+        'A': 8, 'B': 8, 'C': 8, 'D': 8, 'E': 8, 'F': 10,
+        'G': 5, 'H': 5,
+        'I': 8, 'J': 8, 'K': 8, 'L': 8, 'M': 8, 'N': 10
+    })
     
-    worksheet.merge_cells('I8:M8')  # Changed from I7:M7 to I8:M8
-    cell = worksheet['I8']  # Changed from I7 to I8
-    cell.value = "Regular days: 8:00 AM - 5:00 PM"
+    # Columns holding values are fitted to them, employee entries can only widen them
+    layout["column_widths"].update(layout_text_widths(layout, covered_cells(layout["merges"])))
     
-    # Add Saturdays info with count (adjust row numbers)
-    worksheet.merge_cells('A9:E9')  # Changed from A8:E8 to A9:E9
-    cell = worksheet['A9']  # Changed from A8 to A9
-    cell.value = f"Saturdays: {saturday_count} day(s)"
+    return layout
+
+def build_employee_dtr_layout(employee_days, employee_name):
+    """
+    Lays out the cells of one employee's Form 48 that differ from the
+    month template: the name, the Saturday count, the day entries and the
+    total undertime. Cells without a style keep the template's style.
+    """
+    if employee_days.empty:
+        return None
     
-    worksheet.merge_cells('I9:M9')  # Changed from I8:M8 to I9:M9
-    cell = worksheet['I9']  # Changed from I8 to I9
-    cell.value = f"Saturdays: {saturday_count} day(s)"
+    # Saturdays with logs
+    saturday_count = int(((employee_days["Weekday"] == 5) & (employee_days["Logs"] > 0)).sum())
     
-    # --- Table Headers --- (adjust row numbers)
-    # Create table headers - First set
-    worksheet['A10'] = "Day"  # Changed from A9 to A10
-    worksheet['B10'] = "Arrival"  # Changed from B9 to B10
-    worksheet['C10'] = "Departure"  # Changed from C9 to C10
-    worksheet['D10'] = "Arrival"  # Changed from D9 to D10
-    worksheet['E10'] = "Departure"  # Changed from E9 to E10
-    worksheet['F10'] = "Undertime"  # Changed from F9 to F10
+    # Total undertime, only the regular days carry any
+    total_undertime_mins = int(employee_days["UndertimeMinutes"].to_numpy().sum())
     
-    # Create table headers - Second set
-    worksheet['I10'] = "Day"  # Changed from I9 to I10
-    worksheet['J10'] = "Arrival"  # Changed from J9 to J10
-    worksheet['K10'] = "Departure"  # Changed from K9 to K10
-    worksheet['L10'] = "Arrival"  # Changed from L9 to L10
-    worksheet['M10'] = "Departure"  # Changed from M9 to M10
-    worksheet['N10'] = "Undertime"  # Changed from N9 to N10
+    # Convert total undertime minutes to hours and minutes
+    total_undertime_hours = total_undertime_mins // 60
+    total_undertime_minutes = total_undertime_mins % 60
+    total_undertime_str = f"{total_undertime_hours:02}:{total_undertime_minutes:02}"
     
-    # Style the headers
-    for col in range(1, 7):
-        col_letter = get_column_letter(col)
-        cell = worksheet[f'{col_letter}10']  # Changed from row 9 to row 10
-        cell.alignment = Alignment(horizontal='center')
-        cell.border = openpyxl.styles.Border(
-            left=openpyxl.styles.Side(border_style='thin'),
-            right=openpyxl.styles.Side(border_style='thin'),
-            top=openpyxl.styles.Side(border_style='thin'),
-            bottom=openpyxl.styles.Side(border_style='thin')
-        )
+    # Official hours of the schedules the employee works on weekdays
+    weekday_schedules = pd.unique(employee_days.loc[employee_days["Weekday"] < 5, "Schedule"])
+    if len(weekday_schedules) == 0:
+        weekday_schedules = [work_schedules["default"]]
+    hours_text = " / ".join(work_schedules["hours_text"][weekday_schedules])
     
-    for col in range(9, 15):
-        col_letter = get_column_letter(col)
-        cell = worksheet[f'{col_letter}10']  # Changed from row 9 to row 10
-        cell.alignment = Alignment(horizontal='center')
-        cell.border = openpyxl.styles.Border(
-            left=openpyxl.styles.Side(border_style='thin'),
-            right=openpyxl.styles.Side(border_style='thin'),
-            top=openpyxl.styles.Side(border_style='thin'),
-            bottom=openpyxl.styles.Side(border_style='thin')
-        )
+    days = list(zip(employee_days["ArrivalText"], employee_days["DepartureText"], employee_days["LunchOut"],
+                    employee_days["LunchIn"], employee_days["Status"], employee_days["UndertimeText"]))
     
-    # Fill the table with the calendar data
-    row_start = 11  # Changed from 10 to 11
-    total_undertime_mins = 0
+    layout = new_sheet_layout()
     
-    for day, data in calendar_data.items():
-        if day <= 31:  # Ensure we don't go beyond the maximum days
-            # Day number cell
-            cell = worksheet[f'A{row_start}']
-            cell.value = day
-            cell.alignment = Alignment(horizontal='center')
-            
-            # For Saturday/Sunday, still show time if available
-            if data['special'] in ['SATURDAY', 'SUNDAY']:
-                if data['arrival'] or data['departure']:
-                    # If they have logs, show them
-                    cell = worksheet[f'B{row_start}']
-                    cell.value = data['arrival'] if data['arrival'] else ''
-                    cell.alignment = Alignment(horizontal='center')
-                    
-                    cell = worksheet[f'C{row_start}']
-                    cell.value = data['lunch_out'] if data['lunch_out'] else ''
-                    cell.alignment = Alignment(horizontal='center')
-                    
-                    cell = worksheet[f'D{row_start}']
-                    cell.value = data['lunch_in'] if data['lunch_in'] else ''
-                    cell.alignment = Alignment(horizontal='center')
-                    
-                    cell = worksheet[f'E{row_start}']
-                    cell.value = data['departure'] if data['departure'] else ''
-                    cell.alignment = Alignment(horizontal='center')
-                    
-                    cell = worksheet[f'F{row_start}']
-                    cell.value = ''  # No undertime for weekends
-                    cell.alignment = Alignment(horizontal='center')
-                else:
-                    # No logs, just show the day type
-                    worksheet.merge_cells(f'B{row_start}:F{row_start}')
-                    cell = worksheet[f'B{row_start}']
-                    cell.value = data['special']
-                    cell.alignment = Alignment(horizontal='center')
-            elif data['special'] == 'ABSENT':
-                # For absent days
-                worksheet.merge_cells(f'B{row_start}:F{row_start}')
-                cell = worksheet[f'B{row_start}']
-                cell.value = 'ABSENT'
-                cell.alignment = Alignment(horizontal='center')
+    for col in (1, 9):
+        put_cell(layout, 3, col, employee_name.upper())
+        if list(weekday_schedules) != [work_schedules["default"]]:
+            # The template shows the default schedule
+            put_cell(layout, 8, col, f"Regular days: {hours_text}")
+        put_cell(layout, 9, col, f"Saturdays: {saturday_count} day(s)")
+        
+        # Overlay the employee's day rows on the template's calendar
+        row_start = 11
+        for arrival, departure, lunch_out, lunch_in, status, undertime in days:
+            if status in NON_WORKING_STATUSES and not (arrival or departure):
+                # No logs, just show the day type
+                entries = [status]
+            elif status in NON_WORKING_STATUSES:
+                # Weekend and holiday logs are shown without undertime
+                entries = [arrival or '', lunch_out or '', lunch_in or '', departure or '', '']
+            elif status == 'ABSENT':
+                entries = ['ABSENT']
             else:
                 # Regular day with time entries
-                cell = worksheet[f'B{row_start}']
-                cell.value = data['arrival']
-                cell.alignment = Alignment(horizontal='center')
-                
-                cell = worksheet[f'C{row_start}']
-                cell.value = data['lunch_out']
-                cell.alignment = Alignment(horizontal='center')
-                
-                cell = worksheet[f'D{row_start}']
-                cell.value = data['lunch_in']
-                cell.alignment = Alignment(horizontal='center')
-                
-                cell = worksheet[f'E{row_start}']
-                cell.value = data['departure']
-                cell.alignment = Alignment(horizontal='center')
-                
-                cell = worksheet[f'F{row_start}']
-                cell.value = data['undertime']  # Add the calculated undertime
-                cell.alignment = Alignment(horizontal='center')
-                
-                # Track total undertime
-                if data['undertime']:
-                    try:
-                        hrs, mins = data['undertime'].split(':')
-                        total_undertime_mins += int(hrs) * 60 + int(mins)
-                    except:
-                        pass
-            
-            # Add borders to cells
-            for col in range(1, 7):
-                col_letter = get_column_letter(col)
-                worksheet[f'{col_letter}{row_start}'].border = openpyxl.styles.Border(
-                    left=openpyxl.styles.Side(border_style='thin'),
-                    right=openpyxl.styles.Side(border_style='thin'),
-                    top=openpyxl.styles.Side(border_style='thin'),
-                    bottom=openpyxl.styles.Side(border_style='thin')
-                )
-            
-            # Repeat for the second half (identical data for demo purposes)
-            # Day number cell for second half
-            cell = worksheet[f'I{row_start}']
-            cell.value = day
-            cell.alignment = Alignment(horizontal='center')
+                entries = [arrival, lunch_out, lunch_in, departure, undertime]
             
-            # For Saturday/Sunday, still show time if available
-            if data['special'] in ['SATURDAY', 'SUNDAY']:
-                if data['arrival'] or data['departure']:
-                    # If they have logs, show them
-                    cell = worksheet[f'J{row_start}']
-                    cell.value = data['arrival'] if data['arrival'] else ''
-                    cell.alignment = Alignment(horizontal='center')
-                    
-                    cell = worksheet[f'K{row_start}']
-                    cell.value = data['lunch_out'] if data['lunch_out'] else ''
-                    cell.alignment = Alignment(horizontal='center')
-                    
-                    cell = worksheet[f'L{row_start}']
-                    cell.value = data['lunch_in'] if data['lunch_in'] else ''
-                    cell.alignment = Alignment(horizontal='center')
-                    
-                    cell = worksheet[f'M{row_start}']
-                    cell.value = data['departure'] if data['departure'] else ''
-                    cell.alignment = Alignment(horizontal='center')
-                    
-                    cell = worksheet[f'N{row_start}']
-                    cell.value = ''  # No undertime for weekends
-                    cell.alignment = Alignment(horizontal='center')
-                else:
-                    # No logs, just show the day type
-                    worksheet.merge_cells(f'J{row_start}:N{row_start}')
-                    cell = worksheet[f'J{row_start}']
-                    cell.value = data['special']
-                    cell.alignment = Alignment(horizontal='center')
-            elif data['special'] == 'ABSENT':
-                # For absent days
-                worksheet.merge_cells(f'J{row_start}:N{row_start}')
-                cell = worksheet[f'J{row_start}']
-                cell.value = 'ABSENT'
-                cell.alignment = Alignment(horizontal='center')
+            if len(entries) == 1:
+                # A lone entry spans the row, the merged cells keep their borders
+                merge_layout_cells(layout, row_start, col + 1, row_start, col + 5)
+                put_cell(layout, row_start, col + 1, entries[0])
+                for offset in range(2, 6):
+                    put_cell(layout, row_start, col + offset, None, "DTR Box")
             else:
-                # Regular day with time entries
-                cell = worksheet[f'J{row_start}']
-                cell.value = data['arrival']
-                cell.alignment = Alignment(horizontal='center')
-                
-                cell = worksheet[f'K{row_start}']
-                cell.value = data['lunch_out']
-                cell.alignment = Alignment(horizontal='center')
-                
-                cell = worksheet[f'L{row_start}']
-                cell.value = data['lunch_in']
-                cell.alignment = Alignment(horizontal='center')
-                
-                cell = worksheet[f'M{row_start}']
-                cell.value = data['departure']
-                cell.alignment = Alignment(horizontal='center')
-                
-                cell = worksheet[f'N{row_start}']
-                cell.value = data['undertime']  # Add the calculated undertime
-                cell.alignment = Alignment(horizontal='center')
+                for offset, entry in enumerate(entries, start=1):
+                    put_cell(layout, row_start, col + offset, entry)
             
-            # Add borders to cells in second half
-            for col in range(9, 15):
-                col_letter = get_column_letter(col)
-                worksheet[f'{col_letter}{row_start}'].border = openpyxl.styles.Border(
-                    left=openpyxl.styles.Side(border_style='thin'),
-                    right=openpyxl.styles.Side(border_style='thin'),
-                    top=openpyxl.styles.Side(border_style='thin'),
-                    bottom=openpyxl.styles.Side(border_style='thin')
-                )
-                
             row_start += 1
+        
+        # Total undertime below the day rows
+        put_cell(layout, row_start, col + 5, total_undertime_str if total_undertime_mins > 0 else "")
     
-    # Convert total undertime minutes to hours and minutes
-    total_undertime_hours = total_undertime_mins // 60
-    total_undertime_minutes = total_undertime_mins % 60
-    total_undertime_str = f"{total_undertime_hours:02}:{total_undertime_minutes:02}"
-    
-    # Add Total row
-    cell = worksheet[f'A{row_start}']
-    cell.value = "Total"
-    cell.alignment = Alignment(horizontal='center')
-    cell.font = Font(bold=True)
-    
-    # Add total undertime
-    cell = worksheet[f'F{row_start}']
-    cell.value = total_undertime_str if total_undertime_mins > 0 else ""
-    cell.alignment = Alignment(horizontal='center')
-    cell.font = Font(bold=True)
-    
-    # Add borders to total row
-    for col in range(1, 7):
-        col_letter = get_column_letter(col)
-        worksheet[f'{col_letter}{row_start}'].border = openpyxl.styles.Border(
-            left=openpyxl.styles.Side(border_style='thin'),
-            right=openpyxl.styles.Side(border_style='thin'),
-            top=openpyxl.styles.Side(border_style='thin'),
-            bottom=openpyxl.styles.Side(border_style='thin')
-        )
-    
-    # Repeat for second half
-    cell = worksheet[f'I{row_start}']
-    cell.value = "Total"
-    cell.alignment = Alignment(horizontal='center')
-    cell.font = Font(bold=True)
-    
-    # Add total undertime to second half
-    cell = worksheet[f'N{row_start}']
-    cell.value = total_undertime_str if total_undertime_mins > 0 else ""
-    cell.alignment = Alignment(horizontal='center')
-    cell.font = Font(bold=True)
-    
-    # Add borders to total row in second half
-    for col in range(9, 15):
-        col_letter = get_column_letter(col)
-        worksheet[f'{col_letter}{row_start}'].border = openpyxl.styles.Border(
-            left=openpyxl.styles.Side(border_style='thin'),
-            right=openpyxl.styles.Side(border_style='thin'),
-            top=openpyxl.styles.Side(border_style='thin'),
-            bottom=openpyxl.styles.Side(border_style='thin')
-        )
-    
-    # Add certification text
-    certification_row = row_start + 2
-    
-    # First DTR certification
-    worksheet.merge_cells(f'A{certification_row}:F{certification_row}')
-    cell = worksheet[f'A{certification_row}']
-    cell.value = "I certify on my honor that the above is a true and"
-    cell.alignment = Alignment(horizontal='center')
-    
-    cert_row2 = certification_row + 1
-    worksheet.merge_cells(f'A{cert_row2}:F{cert_row2}')
-    cell = worksheet[f'A{cert_row2}']
-    cell.value = "correct report of the hours of work performed, record"
-    cell.alignment = Alignment(horizontal='center')
-    
-    cert_row3 = cert_row2 + 1
-    worksheet.merge_cells(f'A{cert_row3}:F{cert_row3}')
-    cell = worksheet[f'A{cert_row3}']
-    cell.value = "of which was made daily at the time of arrival and"
-    cell.alignment = Alignment(horizontal='center')
-    
-    cert_row4 = cert_row3 + 1
-    worksheet.merge_cells(f'A{cert_row4}:F{cert_row4}')
-    cell = worksheet[f'A{cert_row4}']
-    cell.value = "departure from office."
-    cell.alignment = Alignment(horizontal='center')
-    
-    # Second DTR certification (mirror of the first)
-    worksheet.merge_cells(f'I{certification_row}:N{certification_row}')
-    cell = worksheet[f'I{certification_row}']
-    cell.value = "I certify on my honor that the above is a true and"
-    cell.alignment = Alignment(horizontal='center')
-    
-    worksheet.merge_cells(f'I{cert_row2}:N{cert_row2}')
-    cell = worksheet[f'I{cert_row2}']
-    cell.value = "correct report of the hours of work performed, record"
-    cell.alignment = Alignment(horizontal='center')
-    
-    worksheet.merge_cells(f'I{cert_row3}:N{cert_row3}')
-    cell = worksheet[f'I{cert_row3}']
-    cell.value = "of which was made daily at the time of arrival and"
-    cell.alignment = Alignment(horizontal='center')
-    
-    worksheet.merge_cells(f'I{cert_row4}:N{cert_row4}')
-    cell = worksheet[f'I{cert_row4}']
-    cell.value = "departure from office."
-    cell.alignment = Alignment(horizontal='center')
-    
-    # Add signature lines
-    sig_row = cert_row4 + 3  # Add space before signature line
-    
-    # First DTR signature line
-    worksheet.merge_cells(f'A{sig_row}:F{sig_row}')
-    cell = worksheet[f'A{sig_row}']
-    cell.value = "_" * 40
-    cell.alignment = Alignment(horizontal='center')
-    
-    sig_label_row = sig_row + 1
-    worksheet.merge_cells(f'A{sig_label_row}:F{sig_label_row}')
-    cell = worksheet[f'A{sig_label_row}']
-    cell.value = "Signature of Employee"
-    cell.alignment = Alignment(horizontal='center')
-    
-    # Second DTR signature line
-    worksheet.merge_cells(f'I{sig_row}:N{sig_row}')
-    cell = worksheet[f'I{sig_row}']
-    cell.value = "_" * 40
-    cell.alignment = Alignment(horizontal='center')
-    
-    worksheet.merge_cells(f'I{sig_label_row}:N{sig_label_row}')
-    cell = worksheet[f'I{sig_label_row}']
-    cell.value = "Signature of Employee"
-    cell.alignment = Alignment(horizontal='center')
-    
-    # Add verification text
-    verify_row = sig_label_row + 2
-    
-    # First DTR verification
-    worksheet.merge_cells(f'A{verify_row}:F{verify_row}')
-    cell = worksheet[f'A{verify_row}']
-    cell.value = "Verified as to the prescribed office hours."
-    cell.alignment = Alignment(horizontal='center')
-    
-    # Second DTR verification
-    worksheet.merge_cells(f'I{verify_row}:N{verify_row}')
-    cell = worksheet[f'I{verify_row}']
-    cell.value = "Verified as to the prescribed office hours."
-    cell.alignment = Alignment(horizontal='center')
-    
-    # Add supervisor signature lines
-    super_sig_row = verify_row + 3
-    
-    # First DTR supervisor signature
-    worksheet.merge_cells(f'A{super_sig_row}:F{super_sig_row}')
-    cell = worksheet[f'A{super_sig_row}']
-    cell.value = "_" * 40
-    cell.alignment = Alignment(horizontal='center')
-    
-    # Second DTR supervisor signature
-    worksheet.merge_cells(f'I{super_sig_row}:N{super_sig_row}')
-    cell = worksheet[f'I{super_sig_row}']
-    cell.value = "_" * 40
-    cell.alignment = Alignment(horizontal='center')
-    
-    # Add supervisor name and position
-    name_row = super_sig_row + 1
-    
-    # First DTR supervisor name
-    worksheet.merge_cells(f'A{name_row}:F{name_row}')
-    cell = worksheet[f'A{name_row}']
-    cell.value = "FORTUNATO L. PALILEO"
-    cell.alignment = Alignment(horizontal='center')
-    cell.font = Font(bold=True)
-    
-    # Second DTR supervisor name
-    worksheet.merge_cells(f'I{name_row}:N{name_row}')
-    cell = worksheet[f'I{name_row}']
-    cell.value = "FORTUNATO L. PALILEO"
-    cell.alignment = Alignment(horizontal='center')
-    cell.font = Font(bold=True)
-    
-    # Add supervisor position
-    pos_row = name_row + 1
-    
-    # First DTR supervisor position
-    worksheet.merge_cells(f'A{pos_row}:F{pos_row}')
-    cell = worksheet[f'A{pos_row}']
-    cell.value = "CHIEF, EDP SERVICES"
-    cell.alignment = Alignment(horizontal='center')
-    
-    # Second DTR supervisor position
-    worksheet.merge_cells(f'I{pos_row}:N{pos_row}')
-    cell = worksheet[f'I{pos_row}']
-    cell.value = "CHIEF, EDP SERVICES"
-    cell.alignment = Alignment(horizontal='center')
-    
-    # Set column widths to match expected format (this stays as it was)
-    worksheet.column_dimensions['A'].width = 8
-    worksheet.column_dimensions['B'].width = 8
-    worksheet.column_dimensions['C'].width = 8
-    worksheet.column_dimensions['D'].width = 8
-    worksheet.column_dimensions['E'].width = 8
-    worksheet.column_dimensions['F'].width = 10
-    
-    # Add gap columns (G, H)
-    worksheet.column_dimensions['G'].width = 5
-    worksheet.column_dimensions['H'].width = 5
-    
-    # Second DTR section columns
-    worksheet.column_dimensions['I'].width = 8
-    worksheet.column_dimensions['J'].width = 8
-    worksheet.column_dimensions['K'].width = 8
-    worksheet.column_dimensions['L'].width = 8
-    worksheet.column_dimensions['M'].width = 8
-    worksheet.column_dimensions['N'].width = 10
-
-from openpyxl.utils import get_column_letter
-from openpyxl import load_workbook
-
-def auto_adjust_column_widths(file_path):
-    wb = load_workbook(file_path)
-    
-    for sheet in wb.sheetnames:
-        ws = wb[sheet]
-        column_widths = {}
-
-        for row in ws.iter_rows():
-            for cell in row:
-                if cell.value:
-                    # Check if the cell is part of a merged range
-                    if any(cell.coordinate in merged_range for merged_range in ws.merged_cells):
-                        continue  # Skip merged cells
-                    
-                    col_letter = get_column_letter(cell.column)
-                    column_widths[col_letter] = max(column_widths.get(col_letter, 0), len(str(cell.value)))
-
-        for col, width in column_widths.items():
-            ws.column_dimensions[col].width = width + 2  # Add padding
-
-    wb.save(file_path)
+    return layout
 
 def show_history():
     global history_window, history_window_open
@@ -1409,7 +2191,9 @@ def preview_dat_file(event):
         # Add Convert button for DAT files
         def proceed_to_conversion():
             preview_window.destroy()
-            convert_batch_to_excel([file_path])
+            months = ask_conversion_months([file_path])
+            if months is not False:
+                convert_batch_to_excel([file_path], months)
 
         proceed_button = tk.Button(preview_window, text="Convert", command=proceed_to_conversion, 
                                   font=("Segoe UI", 12, "bold"), fg="white", bg="#4CAF50", 
@@ -1543,6 +2327,34 @@ def browse_and_preview_dat_files():
                 preview_dat_files.insert(tk.END, f"Error reading {file_path}: {e}\n\n")
         
         preview_dat_files.config(state=tk.DISABLED)
+def ask_conversion_months(files):
+    """
+    Asks which months of the DAT files to convert, the newest one by
+    default. Returns the choice for dat_file_months, or False if cancelled.
+    """
+    initial = LATEST_MONTH
+    if len(files) == 1:
+        try:
+            latest = latest_dat_month(files[0])
+        except OSError:
+            latest = None
+        if latest is not None:
+            initial = str(latest)
+
+    while True:
+        text = simpledialog.askstring(
+            "Months to Convert",
+            "Months to convert (YYYY-MM, separated by commas),\n\"latest\" for the newest month of each file, or \"all\":",
+            initialvalue=initial
+        )
+        if text is None:
+            return False
+        try:
+            return parse_month_choice(text)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            initial = text
+
 def convert_files():
     employee_file = employee_list_entry.get()
     dat_files = dat_file_entry.get().split(", ")
@@ -1555,9 +2367,48 @@ def convert_files():
         # Update employee list first
         upload_employee_list_from_path(employee_file)
 
-        # Convert DAT files
-        convert_batch_to_excel(dat_files)
+        months = ask_conversion_months(dat_files)
+        if months is False:
+            return
+
+        # Convert DAT files, several at once in worker processes
+        if len(dat_files) > 1:
+            convert_batch_to_excel_parallel(dat_files, months)
+        else:
+            convert_batch_to_excel(dat_files, months)
+
+    except Exception as e:
+        messagebox.showerror("Error", str(e))
+
+def convert_files_per_employee():
+    employee_file = employee_list_entry.get()
+    dat_files = dat_file_entry.get().split(", ")
+
+    if not employee_file or not dat_files:
+        messagebox.showwarning("Warning", "Please upload both Employee List and DAT Files")
+        return
+
+    try:
+        upload_employee_list_from_path(employee_file)
+        months = ask_conversion_months(dat_files)
+        if months is not False:
+            convert_per_employee(dat_files, months)
+    except Exception as e:
+        messagebox.showerror("Error", str(e))
+
+def export_payroll_files():
+    employee_file = employee_list_entry.get()
+    dat_files = dat_file_entry.get().split(", ")
 
+    if not employee_file or not dat_files:
+        messagebox.showwarning("Warning", "Please upload both Employee List and DAT Files")
+        return
+
+    try:
+        upload_employee_list_from_path(employee_file)
+        months = ask_conversion_months(dat_files)
+        if months is not False:
+            export_payroll(dat_files, months)
     except Exception as e:
         messagebox.showerror("Error", str(e))
 
@@ -1884,14 +2735,33 @@ def create_improved_gui():
     )
     convert_btn.pack(side=tk.LEFT, padx=10)
 
+    per_employee_btn = StyledTkinter.create_styled_button(
+        button_frame, 
+        "One File per Employee", 
+        convert_files_per_employee,
+        style='primary'
+    )
+    per_employee_btn.pack(side=tk.LEFT, padx=10)
+
+    payroll_btn = StyledTkinter.create_styled_button(
+        button_frame, 
+        "Payroll Export", 
+        export_payroll_files,
+        style='warning'
+    )
+    payroll_btn.pack(side=tk.LEFT, padx=10)
+
     return root, employee_list_entry, preview_employee_list, dat_file_entry, preview_dat_files
     
 
 # Replace the original create_gui() function with this new one
 # Modify the main block
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Needed for worker processes in the bundled exe
     create_database()
     load_employee_list()  # Load employee list from DB if any
+    load_work_schedules()  # Compile the work schedules once for the run
+    load_holidays()  # Holidays and suspensions for the month calendars
     
     # Create the root window and key widgets using the new method
     root, employee_list_entry, preview_employee_list, dat_file_entry, preview_dat_files = create_improved_gui()